@@ -0,0 +1,129 @@
+import os
+import time
+import math
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Optional
+from fastapi import HTTPException, Header, Request
+from auth import verified_tokens
+
+# Defaults for LLM-backed endpoints; each GPT-4 call holds a slot for several seconds
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_PER_USER = int(os.getenv("LLM_PER_USER", "2"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+class AdmissionLimiter:
+    """
+    Bounds how many requests of one endpoint run at once.
+    Requests beyond max_concurrent wait in a bounded queue; when the queue is full or the wait
+    times out we fail fast with 503, and a user exceeding their own share gets 429.
+    """
+
+    def __init__(self, name, max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE,
+                 per_user=LLM_PER_USER, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._per_user = defaultdict(int)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = defaultdict(int)
+        self.max_waiting_seen = 0
+        self._service_time = 5.0  # Running average of seconds per request, seeds Retry-After
+
+    def retry_after(self):
+        # Rough time until a slot frees up for a new arrival
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _reject(self, status_code, reason, detail):
+        self.rejected[reason] += 1
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    async def acquire(self, user_key):
+        if self._per_user[user_key] >= self.per_user:
+            self._reject(429, "per_user", f"Too many concurrent {self.name} requests. Please wait for your previous request.")
+        if self.waiting >= self.max_queue:
+            self._reject(503, "queue_full", f"{self.name} is busy. Please try again shortly.")
+
+        self._per_user[user_key] += 1
+        try:
+            if self._semaphore.locked() or self.waiting:
+                self.waiting += 1
+                self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+            else:
+                # A slot is free: take it without scheduling a wait
+                await self._semaphore.acquire()
+        except BaseException as e:
+            # Timed out, or cancelled by a client disconnect: give the user's share back either way
+            self._release_user(user_key)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(503, "queue_timeout", f"{self.name} is busy. Please try again shortly.")
+            raise
+
+        self.active += 1
+        self.admitted += 1
+        return time.monotonic()
+
+    def release(self, user_key, started_at):
+        self.active -= 1
+        self._semaphore.release()
+        self._release_user(user_key)
+        # Exponential moving average of how long a slot is held
+        self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started_at)
+
+    def _release_user(self, user_key):
+        self._per_user[user_key] -= 1
+        if self._per_user[user_key] <= 0:
+            del self._per_user[user_key]
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth_seen": self.max_waiting_seen,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_seconds": round(self._service_time, 3),
+        }
+
+limiters = {}
+
+# Identify the caller: the user id for an already-verified token, else a hash of the token, else the client IP
+def _user_key(request, authorization):
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.split(" ")[1]
+        return verified_tokens.get(token) or hashlib.sha256(token.encode()).hexdigest()
+    return request.client.host if request.client else "anonymous"
+
+def admission(name, **limits):
+    """
+    FastAPI dependency that holds an admission slot of the named limiter for the duration of the request.
+    Usage: Depends(admission("generate_recipe"))
+    """
+    limiter = limiters.setdefault(name, AdmissionLimiter(name, **limits))
+
+    async def dependency(request: Request, authorization: Optional[str] = Header(None)):
+        user_key = _user_key(request, authorization)
+        started_at = await limiter.acquire(user_key)
+        try:
+            yield
+        finally:
+            limiter.release(user_key, started_at)
+
+    return dependency
+
+def admission_stats():
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -1,20 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends, status,Header
+from fastapi import FastAPI, HTTPException, Depends, status,Header, Response, Request
 from pydantic import BaseModel, condecimal
 from bson import ObjectId
 from fastapi.middleware.cors import CORSMiddleware
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime, timedelta
 from enum import Enum
 from main import users_collection, stores_collection, items_collection, recipes_collection, grocery_lists_collection
-from openai_grocerylist import generate_grocery_list 
-from openai_json_recipe import generate_recipe, save_recipe_to_db
-from openai_recipe_grocery_list import generate_grocery_list_from_recipe
+from openai_grocerylist import generate_grocery_list_document, regenerate_grocery_list
+from batch_grocery_lists import generate_grocery_lists_batch
+from openai_json_recipe import generate_recipe, save_recipe_to_db, store_ingredient_matches
+from openai_recipe_grocery_list import generate_grocery_list_from_recipe, generate_meal_plan_grocery_list
+from db_indexes import ensure_indexes
+from recipe_search import recipe_name_index
+from pagination import paginate, InvalidCursor
+from bson_response import MongoJSONResponse
+from metrics import timed, timing_middleware, render_metrics
+from profiling import profiling_middleware, list_profiles, profile_path, PROFILE_ADMIN_TOKEN
+from catalog_cache import catalog_cache
+from item_catalog import item_catalog
+from index_artifacts import item_index
+from admission import admission, admission_stats
+from auth import pwd_context, hash_password_async, verify_password_async, password_timing_report, verified_tokens
+from recipe_vector_index import load_or_build_recipe_index, add_recipe_to_index, search_recipes_semantic
+from list_edits import apply_list_edits, InvalidEdit, ListNotFound, ListForbidden, ItemNotFound, ListEditConflict
+from list_documents import compact_recipe_list, hydrate_list, hydrate_lists, keep_named_entries
+from exports import export_grocery_lists, export_saved_recipes, MEDIA_TYPES
+import hmac
 import jwt
 from jwt.exceptions import PyJWTError
 
-app = FastAPI()
+# Serialize responses with orjson, including ObjectId/datetime/Decimal128 from MongoDB documents
+app = FastAPI(default_response_class=MongoJSONResponse)
 
 SECRET_KEY = "2@1&]."  
 ALGORITHM = "HS256" 
@@ -26,12 +45,23 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://chop-n-shop-frontend-534070775559.us-central1.run.app"],  
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
-# Cryptography (for hashing passwords)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Per-request stage timings (Server-Timing header) and latency histograms for /metrics
+app.middleware("http")(timing_middleware)
+
+# On-demand profiling of sampled requests or requests sent with X-Profile: <admin token>
+app.middleware("http")(profiling_middleware)
+
+# Make sure the indexes backing our queries exist before serving traffic
+@app.on_event("startup")
+async def create_indexes():
+    # Index builds can take a while; keep the event loop free while they run
+    await run_in_threadpool(ensure_indexes)
+    await run_in_threadpool(recipe_name_index.refresh, recipes_collection)
+    await run_in_threadpool(load_or_build_recipe_index)
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
@@ -46,10 +76,17 @@ def get_current_user(authorization: str = Header(...)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization header missing or invalid")
     try:
         token = authorization.split(" ")[1]  # "Bearer <token>"
+
+        # Fast path: this exact token was already verified and has not expired yet
+        user_id = verified_tokens.get(token)
+        if user_id:
+            return user_id
+
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User ID not found in token")
+        verified_tokens.put(token, user_id, payload.get("exp"))
         return user_id
     except PyJWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {str(e)}")
@@ -72,6 +109,20 @@ class UserPreferences(BaseModel):
     Allergies: List[str]
     Store_preference: Optional[str] = None
 
+# Only the fields sent are changed; everything else comes from the saved list
+class RegenerateRequest(BaseModel):
+    Budget: Optional[float] = None
+    Grocery_items: Optional[List[str]] = None
+    Dietary_preferences: Optional[str] = None
+    Allergies: Optional[List[str]] = None
+    Store_preference: Optional[str] = None
+
+class BatchUserPreferences(UserPreferences):
+    user_id: str
+
+class BatchGroceryListRequest(BaseModel):
+    preferences: List[BatchUserPreferences]
+
 class SaveRecipeRequest(BaseModel):
     recipe_name: str
     ingredients: List[str]
@@ -139,16 +190,55 @@ class RecipeResponse(BaseModel):
     over_budget: float
     user_id: str
 
+class MealPlanRequest(BaseModel):
+    recipe_ids: List[str]
+    user_preferences: RecipeListUserPreferences
+    list_name: Optional[str] = None
+
+class MealPlanItem(GroceryItem):
+    recipe_ids: List[str]  # Recipes this item is bought for
+
+class MealPlanResponse(BaseModel):
+    list_id: str
+    recipe_ids: List[str]
+    grocery_list: List[MealPlanItem]
+    total_cost: float
+    over_budget: float
+    user_id: str
+
 class NewGroceryItem(BaseModel):
     Item_name: str
     Store_name: str
     Price: float
 
+class ListEditOp(str, Enum):
+    add = "add"
+    remove = "remove"
+    replace = "replace"
+
+class ListItem(BaseModel):
+    Item_name: str
+    Price: float
+
+class ListEditOperation(BaseModel):
+    op: ListEditOp
+    store: Optional[str] = None  # Required for add; remove/replace search every store when omitted
+    item_name: Optional[str] = None  # Item to remove or replace
+    item: Optional[ListItem] = None  # Item to add, or the replacement
+
+class ListEditRequest(BaseModel):
+    operations: List[ListEditOperation]
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
 # Generate recipe with grocery list
 @app.post("/generate_recipe_with_grocery_list", response_model=RecipeResponse)
 async def generate_recipe_with_grocery_list(
     recipe_request: RecipeRequest,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    _admitted: None = Depends(admission("generate_recipe_with_grocery_list"))
 ):
     try:
         # Step 1: Check if the recipe exists
@@ -159,25 +249,27 @@ async def generate_recipe_with_grocery_list(
         # Step 2: Generate the grocery list
         recipe_id = recipe["_id"]
         try:
-            grocery_list, total_cost, over_budget = generate_grocery_list_from_recipe(
+            # Run the embedding/LLM work on the threadpool so the event loop stays responsive
+            grocery_list, total_cost, over_budget = await run_in_threadpool(
+                generate_grocery_list_from_recipe,
                 recipe_id=recipe_id, user_preferences=recipe_request.user_preferences.dict()
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating grocery list: {str(e)}")
 
-        # Step 3: Save the grocery list with user ID
-        recipe_list_document = {
+        # Step 3: Save the grocery list with user ID (items stored as references, see list_documents.py)
+        recipe_list_document = compact_recipe_list({
             "list_name": recipe_request.list_name or f"Recipe List for {recipe_request.recipe_name}",
             "recipe_name": recipe_request.recipe_name,
             "recipe_id": str(recipe_id),
-            "grocery_list": grocery_list,
             "total_cost": total_cost,
             "over_budget": over_budget,
             "created_at": datetime.utcnow(),
             "user_id": current_user
-        }
+        }, grocery_list)
         try:
-            result = grocery_lists_collection.insert_one(recipe_list_document)
+            with timed("db_write"):
+                result = grocery_lists_collection.insert_one(recipe_list_document)
             inserted_id = result.inserted_id
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving grocery list: {str(e)}")
@@ -196,6 +288,51 @@ async def generate_recipe_with_grocery_list(
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+# One consolidated shopping list for several recipes
+@app.post("/meal_plan", response_model=MealPlanResponse)
+async def generate_meal_plan(
+    meal_plan: MealPlanRequest,
+    current_user: str = Depends(get_current_user),
+    _admitted: None = Depends(admission("meal_plan"))
+):
+    if not meal_plan.recipe_ids:
+        raise HTTPException(status_code=400, detail="recipe_ids cannot be empty.")
+    if not all(ObjectId.is_valid(recipe_id) for recipe_id in meal_plan.recipe_ids):
+        raise HTTPException(status_code=400, detail="Invalid recipe ID")
+
+    try:
+        grocery_list, total_cost, over_budget = await run_in_threadpool(
+            generate_meal_plan_grocery_list,
+            recipe_ids=meal_plan.recipe_ids, user_preferences=meal_plan.user_preferences.dict()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating grocery list: {str(e)}")
+
+    meal_plan_document = compact_recipe_list({
+        "list_name": meal_plan.list_name or f"Meal Plan ({len(meal_plan.recipe_ids)} recipes)",
+        "recipe_ids": meal_plan.recipe_ids,
+        "total_cost": total_cost,
+        "over_budget": over_budget,
+        "created_at": datetime.utcnow(),
+        "user_id": current_user
+    }, grocery_list)
+    try:
+        with timed("db_write"):
+            result = grocery_lists_collection.insert_one(meal_plan_document)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving grocery list: {str(e)}")
+
+    return MealPlanResponse(
+        list_id=str(result.inserted_id),
+        recipe_ids=meal_plan.recipe_ids,
+        grocery_list=[MealPlanItem(**item) for item in grocery_list],
+        total_cost=total_cost,
+        over_budget=over_budget,
+        user_id=current_user
+    )
+
 # Fetch saved recipe lists by name
 @app.get("/recipe_lists/")
 async def get_recipe_list_by_name(list_name: str):
@@ -207,16 +344,17 @@ async def get_recipe_list_by_name(list_name: str):
         if not recipe_list:
             raise HTTPException(status_code=404, detail="Recipe list not found")
 
-        # Convert ObjectId to string and return the recipe list
-        recipe_list["_id"] = str(recipe_list["_id"])
-        return recipe_list
+        # Serialized straight from the Mongo document (ObjectId, datetimes included)
+        return MongoJSONResponse(hydrate_list(recipe_list))
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Error fetching recipe list by name: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
     
-# Utility functions for password handling
+# Utility functions for password handling (blocking; the routes use the async versions in auth.py)
 def hash_password(password: str):
     return pwd_context.hash(password)
 
@@ -232,7 +370,7 @@ async def add_user(user: User):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already in use")
 
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
 
     user_document = {
         "first_name": user.first_name,
@@ -251,15 +389,103 @@ async def add_user(user: User):
 @app.post("/login/")
 async def login(user: LoginUser):
     existing_user = users_collection.find_one({"email": user.email})
-    if not existing_user or not verify_password(user.password, existing_user["password"]):
+    if not existing_user or not await verify_password_async(user.password, existing_user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Generate JWT token
     access_token = create_access_token(data={"sub": str(existing_user["_id"])})
     return {"message": "Login successful", "access_token": access_token, "token_type": "bearer"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: per-stage and per-route latency histograms plus admission gauges.
+    """
+    lines = [
+        "# HELP chopnshop_admission_queue_depth Requests waiting for an LLM slot.",
+        "# TYPE chopnshop_admission_queue_depth gauge",
+    ]
+    stats = admission_stats()
+    for name, limiter in stats.items():
+        lines.append(f'chopnshop_admission_queue_depth{{endpoint="{name}"}} {limiter["queue_depth"]}')
+    lines += [
+        "# HELP chopnshop_admission_active Requests currently holding an LLM slot.",
+        "# TYPE chopnshop_admission_active gauge",
+    ]
+    for name, limiter in stats.items():
+        lines.append(f'chopnshop_admission_active{{endpoint="{name}"}} {limiter["active"]}')
+    lines += [
+        "# HELP chopnshop_admission_rejected_total Requests rejected by admission control.",
+        "# TYPE chopnshop_admission_rejected_total counter",
+    ]
+    for name, limiter in stats.items():
+        for reason, count in limiter["rejected"].items():
+            lines.append(f'chopnshop_admission_rejected_total{{endpoint="{name}",reason="{reason}"}} {count}')
+    index = item_index.status()
+    if index["loaded"]:
+        lines += [
+            "# HELP chopnshop_item_index_items Vectors in the live item FAISS index.",
+            "# TYPE chopnshop_item_index_items gauge",
+            f'chopnshop_item_index_items{{version="{index["version"]}"}} {index["count"]}',
+            "# HELP chopnshop_item_index_swaps_total Hot swaps of the item FAISS index since startup.",
+            "# TYPE chopnshop_item_index_swaps_total counter",
+            f"chopnshop_item_index_swaps_total {index['swaps']}",
+        ]
+    catalog = item_catalog.footprint()
+    if catalog["loaded"]:
+        lines += [
+            "# HELP chopnshop_item_catalog_items Items held by the in-memory item catalog.",
+            "# TYPE chopnshop_item_catalog_items gauge",
+            f"chopnshop_item_catalog_items {catalog['items']}",
+            "# HELP chopnshop_item_catalog_bytes Approximate memory used by the in-memory item catalog.",
+            "# TYPE chopnshop_item_catalog_bytes gauge",
+            f"chopnshop_item_catalog_bytes {catalog['bytes']}",
+            "# HELP chopnshop_item_catalog_version Catalog version of the loaded item catalog snapshot.",
+            "# TYPE chopnshop_item_catalog_version gauge",
+            f"chopnshop_item_catalog_version {catalog['version']}",
+        ]
+    return Response(content=render_metrics(["\n".join(lines)]), media_type="text/plain; version=0.0.4")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Constant-time compare; bytes so a non-ASCII header is a mismatch rather than a TypeError
+    if not PROFILE_ADMIN_TOKEN or not hmac.compare_digest((x_admin_token or "").encode(), PROFILE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token missing or invalid")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def get_profiles():
+    """
+    List stored request profiles, newest first.
+    """
+    return {"profiles": list_profiles()}
+
+@app.get("/admin/profiles/{profile_name}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_name: str):
+    path = profile_path(profile_name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=profile_name)
+
+@app.get("/admission/metrics")
+async def get_admission_metrics():
+    """
+    Queue depth, in-flight count and rejections for each LLM-backed endpoint.
+    """
+    return admission_stats()
+
+@app.get("/auth/timings", dependencies=[Depends(require_admin)])
+async def get_auth_timings():
+    """
+    Recent bcrypt hash/verify timings and the configured cost factor.
+    """
+    return password_timing_report()
+
 @app.post("/generate_grocery_list/")
-async def generate_grocery_list_endpoint(user_preferences: UserPreferences, list_name: Optional[str] = None, current_user: str = Depends(get_current_user)):
+async def generate_grocery_list_endpoint(
+    user_preferences: UserPreferences,
+    list_name: Optional[str] = None,
+    current_user: str = Depends(get_current_user),
+    _admitted: None = Depends(admission("generate_grocery_list"))
+):
     try:
         # Validate input items
         if not user_preferences.Grocery_items:
@@ -268,8 +494,8 @@ async def generate_grocery_list_endpoint(user_preferences: UserPreferences, list
         # Handle the store name being None
         store_preference = user_preferences.Store_preference if user_preferences.Store_preference else None
 
-        # Generate grocery list based on preferences
-        grocery_list = generate_grocery_list({
+        # Generate grocery list based on preferences (compact document, see list_documents.py)
+        grocery_list = await run_in_threadpool(generate_grocery_list_document, {
             "Budget": user_preferences.Budget,
             "Grocery_items": user_preferences.Grocery_items,
             "Dietary_preferences": user_preferences.Dietary_preferences,
@@ -277,10 +503,6 @@ async def generate_grocery_list_endpoint(user_preferences: UserPreferences, list
             "Store_preference": store_preference,
         })
 
-        # Remove _id if present before inserting into the database
-        if "_id" in grocery_list:
-            del grocery_list["_id"]
-
         # Insert the generated grocery list into the collection with user association
         grocery_list["user_id"] = current_user  # Associate the list with the logged-in user
         grocery_list["created_at"] = datetime.utcnow()
@@ -289,10 +511,13 @@ async def generate_grocery_list_endpoint(user_preferences: UserPreferences, list
         if user_preferences.list_name:
             grocery_list["list_name"] = user_preferences.list_name
 
-        # Insert the grocery list into the database
-        grocery_lists_collection.insert_one(grocery_list)
+        # Insert the grocery list into the database: the only write for this generation
+        with timed("db_write"):
+            grocery_lists_collection.insert_one(grocery_list)
 
-        # Return the grocery list with its new _id
+        # Return the grocery list with its new _id; the resolution trace stays in the database
+        grocery_list.pop("resolution_trace", None)
+        grocery_list = hydrate_list(grocery_list)
         grocery_list["_id"] = str(grocery_list["_id"])
         print(grocery_list)
         return {"grocery_list": grocery_list}
@@ -301,9 +526,70 @@ async def generate_grocery_list_endpoint(user_preferences: UserPreferences, list
         print(f"Error generating grocery list: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again.")
 
+# Rebuild a saved list after a preference change from its stored resolution trace
+@app.post("/grocery_lists/{list_id}/regenerate")
+async def regenerate_grocery_list_endpoint(
+    list_id: str,
+    changes: RegenerateRequest,
+    current_user: str = Depends(get_current_user),
+    _admitted: None = Depends(admission("regenerate_grocery_list"))
+):
+    if not ObjectId.is_valid(list_id):
+        raise HTTPException(status_code=400, detail="Invalid list ID")
+    saved = grocery_lists_collection.find_one({"_id": ObjectId(list_id)})
+    if saved is None:
+        raise HTTPException(status_code=404, detail="Grocery list not found")
+    if saved.get("user_id") != current_user:
+        raise HTTPException(status_code=403, detail="You don't have permission to modify this grocery list")
+    if not saved.get("resolution_trace"):
+        raise HTTPException(
+            status_code=409, detail="This list was created without a resolution trace; generate it again instead."
+        )
+
+    update = changes.dict(exclude_unset=True)
+    if "Grocery_items" in update and not update["Grocery_items"]:
+        raise HTTPException(status_code=400, detail="Items list cannot be empty.")
+    grocery_list, stats = await run_in_threadpool(regenerate_grocery_list, saved["resolution_trace"], update)
+    # Items added or replaced by hand are not in the trace; keep them
+    stats["kept"] = keep_named_entries(grocery_list, saved)
+
+    # Same document, new contents: keep its identity and metadata
+    for field in ("user_id", "created_at", "list_name"):
+        if field in saved:
+            grocery_list[field] = saved[field]
+    grocery_list["updated_at"] = datetime.utcnow()
+    with timed("db_write"):
+        # Only if the items were not edited while we regenerated
+        result = grocery_lists_collection.replace_one(
+            {"_id": saved["_id"], "user_id": current_user, "items": saved.get("items")}, grocery_list
+        )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="The list was edited while regenerating it; try again.")
+
+    grocery_list.pop("resolution_trace")
+    grocery_list = hydrate_list(grocery_list)
+    grocery_list["_id"] = str(saved["_id"])
+    return {"grocery_list": grocery_list, **stats}
+
+# Generate lists for many users at once (nightly regeneration); progress goes to the server log
+@app.post("/admin/grocery_lists/batch", dependencies=[Depends(require_admin)])
+async def generate_grocery_lists_batch_endpoint(
+    batch: BatchGroceryListRequest,
+    _admitted: None = Depends(admission("generate_grocery_list_batch", max_concurrent=1, max_queue=2))
+):
+    if not batch.preferences:
+        raise HTTPException(status_code=400, detail="Preferences list cannot be empty.")
+    preference_sets = [preferences.dict() for preferences in batch.preferences]
+    return await run_in_threadpool(generate_grocery_lists_batch, preference_sets)
+
 # Fetch previous grocery lists for a user
 @app.get("/grocery_lists")
-async def get_grocery_lists(list_name: Optional[str] = None, current_user: str = Depends(get_current_user)):
+async def get_grocery_lists(
+    list_name: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: str = Depends(get_current_user)
+):
     try:
         query = {"user_id": current_user}
         
@@ -311,17 +597,16 @@ async def get_grocery_lists(list_name: Optional[str] = None, current_user: str =
         if list_name:
             query["list_name"] = list_name
         
-        grocery_lists = grocery_lists_collection.find(query)
-        
-        if not grocery_lists:
-            return {"grocery_lists": []}
-            
-        grocery_list_items = []
-        for list_item in grocery_lists:
-            list_item["_id"] = str(list_item["_id"])
-            grocery_list_items.append(list_item)
+        # Newest lists first, one bounded page at a time
+        grocery_lists, next_cursor = paginate(
+            grocery_lists_collection, query, limit=limit, cursor=cursor,
+            projection={"resolution_trace": 0}, sort_field="created_at"
+        )
             
-        return {"grocery_lists": grocery_list_items}
+        # Serialized straight from the Mongo documents (ObjectId, datetimes included)
+        return MongoJSONResponse({"grocery_lists": hydrate_lists(grocery_lists), "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -357,27 +642,47 @@ async def delete_grocery_list(list_id: str, current_user: str = Depends(get_curr
         )
 
 @app.get("/items/")
-async def get_items():
-    items = list(items_collection.find())
-    return [{"Item_name": item["Item_name"], "Price": item["Price"]} for item in items]
+async def get_items(request: Request, limit: int = 100, cursor: Optional[str] = None):
+    def load_items():
+        # Only fetch the fields we return (skips the stored embeddings)
+        items, next_cursor = paginate(
+            items_collection, {}, limit=limit, cursor=cursor,
+            projection={"Item_name": 1, "Price": 1}, descending=False
+        )
+        # The body stays a plain list; the continuation token travels in a header
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return [{"Item_name": item["Item_name"], "Price": item["Price"]} for item in items], headers
+
+    try:
+        # Served from the in-process catalog cache with ETag/304 support
+        return catalog_cache.respond(request, ("items", limit, cursor), load_items)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Route to fetch all stores (can be useful for frontend)
 @app.get("/stores/")
-async def get_stores():
-    stores = list(stores_collection.find())
-    return [{"Store_name": store["Store_name"]} for store in stores]
+async def get_stores(request: Request):
+    def load_stores():
+        stores = stores_collection.find({}, {"Store_name": 1})
+        return [{"Store_name": store["Store_name"]} for store in stores], {}
+
+    return catalog_cache.respond(request, ("stores",), load_stores)
 
 @app.post("/generate_recipe/")
-async def generate_recipe_route(prompt: RecipePrompt):
+async def generate_recipe_route(prompt: RecipePrompt, _admitted: None = Depends(admission("generate_recipe"))):
     try:
-        # Call the function directly
-        recipe = generate_recipe(prompt.recipe_prompt)
+        # Call the function on the threadpool; the OpenAI call blocks for several seconds
+        recipe = await run_in_threadpool(generate_recipe, prompt.recipe_prompt)
         if not recipe:
             raise HTTPException(status_code=400, detail="Failed to generate recipe. Please try again.")
         
         recipe_id = save_recipe_to_db(recipe)
         if not recipe_id:
             raise HTTPException(status_code=500, detail="Failed to save recipe to database.")
+        try:
+            add_recipe_to_index(recipe_id, recipe)
+        except Exception as e:
+            print(f"Error adding recipe {recipe_id} to the recipe index: {e}")
         return {"recipe": recipe}
 
     except Exception as e:
@@ -405,34 +710,59 @@ async def generate_recipe_route(prompt: RecipePrompt):
 #         print(f"Error generating recipe: {str(e)}")
 #         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again.")
 
+@app.get("/recipes/search")
+async def search_recipes(q: str, top_k: int = 10):
+    """
+    Semantic recipe search (e.g. "quick vegan dinner") over the recipe FAISS index.
+    """
+    try:
+        return {"recipes": search_recipes_semantic(q, top_k=max(1, min(top_k, 50)))}
+    except Exception as e:
+        print(f"Error searching recipes: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+@app.get("/recipes/name_search")
+async def search_recipes_by_name(q: str, limit: int = 10):
+    """
+    Ranked fuzzy search over recipe names using the in-process trigram index.
+    """
+    recipe_name_index.refresh_if_stale(recipes_collection)
+    results = recipe_name_index.search(q, limit=min(limit, 50))
+    return {"results": [{"recipe_id": recipe_id, "name": name, "score": score} for recipe_id, name, score in results]}
+
+@app.get("/recipes/autocomplete")
+async def autocomplete_recipe_names(prefix: str, limit: int = 10):
+    """
+    Suggest recipe names for a partially typed query.
+    """
+    recipe_name_index.refresh_if_stale(recipes_collection)
+    return {"suggestions": recipe_name_index.autocomplete(prefix, limit=min(limit, 50))}
+
 @app.get("/recipes/{recipe_name}/")
 async def get_recipe_by_name(recipe_name: str):
     """
     Fetch the first recipe that matches the given name, with case-insensitive partial matching.
     """
     try:
-        # Create a case-insensitive regex pattern
-        name_pattern = f".*{recipe_name}.*"
-        
-        # Use a case-insensitive regex query and get only the first match
-        recipe = recipes_collection.find_one(
-            {"name": {"$regex": name_pattern, "$options": "i"}}
-        )
+        # Resolve the name through the in-process index instead of an unanchored regex scan
+        recipe_name_index.refresh_if_stale(recipes_collection)
+        recipe_id = recipe_name_index.find_substring(recipe_name)
+
+        recipe = recipes_collection.find_one({"_id": ObjectId(recipe_id)}) if recipe_id else None
 
         if not recipe:
             raise HTTPException(status_code=404, detail="No recipe found matching the query")
 
-        # Convert ObjectId to string
-        recipe["_id"] = str(recipe["_id"])
-
-        return recipe
+        return MongoJSONResponse(recipe)
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Error fetching recipe by name: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 @app.get("/api/user")
-async def get_current_user(user_email: str):
+async def get_user_by_email(user_email: str):
     user = users_collection.find_one({"email": user_email}) 
     if not user:
         raise HTTPException(status_code=404, detail=f"User with email {user_email} not found")
@@ -516,6 +846,13 @@ async def save_recipe(
 
         # Insert into database
         result = recipes_collection.insert_one(recipe_document)
+        recipe_name_index.add(result.inserted_id, recipe.recipe_name)
+        try:
+            add_recipe_to_index(result.inserted_id, recipe_document)
+        except Exception as e:
+            # The recipe is saved; the index sync picks it up later
+            print(f"Error adding recipe {result.inserted_id} to the recipe index: {e}")
+        store_ingredient_matches(result.inserted_id, recipe_document)
         
         return {
             "message": "Recipe saved successfully",
@@ -527,18 +864,61 @@ async def save_recipe(
             status_code=500,
             detail=f"Error saving recipe: {str(e)}"
         )
+# Stream a user's whole list history; memory stays at one batch of documents
+@app.get("/grocery_lists/export")
+def export_grocery_lists_endpoint(
+    format: ExportFormat = ExportFormat.ndjson,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: str = Depends(get_current_user)
+):
+    chunks = export_grocery_lists(
+        grocery_lists_collection, current_user, format.value, created_after=created_after, created_before=created_before
+    )
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format.value], headers={
+        "Content-Disposition": f'attachment; filename="grocery_lists.{format.value}"'
+    })
+
+# Fields returned by GET /recipes/saved
+SAVED_RECIPE_PROJECTION = {
+    "name": 1, "ingredients": 1, "instructions": 1, "cooking_time": 1, "servings": 1,
+    "dietary_preferences": 1, "allergies": 1, "created_at": 1
+}
+
+@app.get("/recipes/saved/export")
+def export_saved_recipes_endpoint(
+    format: ExportFormat = ExportFormat.ndjson,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: str = Depends(get_current_user)
+):
+    chunks = export_saved_recipes(
+        recipes_collection, current_user, SAVED_RECIPE_PROJECTION, format.value,
+        created_after=created_after, created_before=created_before
+    )
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format.value], headers={
+        "Content-Disposition": f'attachment; filename="saved_recipes.{format.value}"'
+    })
+
 #testing
 @app.get("/recipes/saved")
-async def get_saved_recipes(current_user: str = Depends(get_current_user)):
+async def get_saved_recipes(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: str = Depends(get_current_user)
+):
     try:
-        # Find all recipes saved by the current user
-        saved_recipes = recipes_collection.find({"user_id": current_user})
+        # Find one page of recipes saved by the current user, newest first
+        saved_recipes, next_cursor = paginate(
+            recipes_collection, {"user_id": current_user}, limit=limit, cursor=cursor,
+            projection=SAVED_RECIPE_PROJECTION, sort_field="created_at"
+        )
         
-        # Convert cursor to list and format the response
+        # Format the response
         recipes_list = []
         for recipe in saved_recipes:
             recipes_list.append({
-                "recipe_id": str(recipe["_id"]),
+                "recipe_id": recipe["_id"],
                 "name": recipe["name"],
                 "ingredients": recipe["ingredients"],
                 "instructions": recipe["instructions"],
@@ -549,75 +929,68 @@ async def get_saved_recipes(current_user: str = Depends(get_current_user)):
                 "created_at": recipe["created_at"] 
             })
             
-        return {
+        return MongoJSONResponse({
             "recipes": recipes_list,
-            "total_count": len(recipes_list)
-        }
+            "total_count": recipes_collection.count_documents({"user_id": current_user}),
+            "next_cursor": next_cursor
+        })
 
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching saved recipes: {str(e)}"
         )
 
+# Apply a batch of add/remove/replace edits to a list in one atomic update
+@app.patch("/grocery_lists/{list_id}")
+async def edit_grocery_list(
+    list_id: str,
+    edits: ListEditRequest,
+    current_user: str = Depends(get_current_user)
+):
+    if not ObjectId.is_valid(list_id):
+        raise HTTPException(status_code=400, detail="Invalid list ID")
+    operations = [
+        {**operation.dict(exclude={"op"}), "op": operation.op.value} for operation in edits.operations
+    ]
+    try:
+        with timed("db_write"):
+            updated_list = apply_list_edits(grocery_lists_collection, list_id, current_user, operations)
+    except InvalidEdit as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ListForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (ListNotFound, ItemNotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ListEditConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return MongoJSONResponse({"grocery_list": updated_list})
+
 @app.delete("/grocery_lists/{list_id}/items/{item_name}")
 async def delete_item_from_grocery_list(
     list_id: str,
     item_name: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: str = Depends(get_current_user)
 ):
+    if not ObjectId.is_valid(list_id):
+        raise HTTPException(status_code=400, detail="Invalid list ID")
     try:
-        current_user_id = current_user.get('id')
-        # print(f"Attempting to delete item '{item_name}' from list '{list_id}' for user ID '{current_user_id}'")
-        
-        if not ObjectId.is_valid(list_id):
-            raise HTTPException(status_code=400, detail="Invalid list ID")
-
-        grocery_list = grocery_lists_collection.find_one({"_id": ObjectId(list_id)})
-        
-        if not grocery_list:
-            print(f"No list found with id '{list_id}'")
-            raise HTTPException(status_code=404, detail="Grocery list not found")
-
-        # print(f"Found grocery list: {grocery_list}")
-        
-        list_user_id = grocery_list.get('user_id')
-        # print(f"List user_id: {list_user_id}, Current user ID: {current_user_id}")
-        
-        if str(list_user_id) != str(current_user_id):
-            print(f"User '{current_user_id}' doesn't have permission. List user_id: {list_user_id}")
-            raise HTTPException(status_code=403, detail="You don't have permission to modify this list")
-
-        # Find and remove the item from the grocery list
-        item_removed = False
-        for store in ["Trader Joe's", "Whole Foods Market"]:
-            result = grocery_lists_collection.update_one(
-                {"_id": ObjectId(list_id)},
-                {"$pull": {f"{store}.items": {"Item_name": item_name}}}
+        # Pull the item from whichever store holds it and recompute totals in the same update
+        with timed("db_write"):
+            apply_list_edits(
+                grocery_lists_collection, list_id, current_user, [{"op": "remove", "item_name": item_name}]
             )
-            if result.modified_count > 0:
-                item_removed = True
-                break
-
-        if not item_removed:
-            raise HTTPException(status_code=404, detail=f"Item '{item_name}' not found in the grocery list")
-
-        # Update the total cost for each store
-        updated_list = grocery_lists_collection.find_one({"_id": ObjectId(list_id)})
-        if updated_list:
-            for store in ["Trader Joe's", "Whole Foods Market"]:
-                if store in updated_list:
-                    new_total_cost = sum(item.get('Price', 0) for item in updated_list[store].get('items', []))
-                    grocery_lists_collection.update_one(
-                        {"_id": ObjectId(list_id)},
-                        {"$set": {f"{store}.Total_Cost": new_total_cost}}
-                    )
-        else:
-            print(f"Warning: Updated list not found. List ID: {list_id}")
-
         return {"message": f"Item '{item_name}' removed from the grocery list successfully"}
-    except HTTPException as he:
-        raise he
+    except ListForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ListNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ItemNotFound:
+        raise HTTPException(status_code=404, detail=f"Item '{item_name}' not found in the grocery list")
+    except ListEditConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print(f"Error in delete_item_from_grocery_list: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred while removing the item: {str(e)}")
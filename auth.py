@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# bcrypt cost factor; each +1 doubles the time per hash. Existing hashes keep their own cost.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop.
+# The pool is bounded: a login burst queues here instead of starving other endpoints.
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "4"))
+
+# Maximum number of verified JWTs kept in memory
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+_password_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="password-hash")
+
+# Recent hashing timings (seconds) per operation, for the timing report
+_timings = {"hash": deque(maxlen=1000), "verify": deque(maxlen=1000)}
+
+def _timed(operation, function, *args):
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        _timings[operation].append(time.perf_counter() - start)
+
+# Utility functions for password handling, run on the password pool
+async def hash_password_async(password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, _timed, "hash", pwd_context.hash, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, _timed, "verify", pwd_context.verify, plain_password, hashed_password
+    )
+
+def password_timing_report():
+    """
+    Summarize recent hash/verify timings in milliseconds.
+    """
+    report = {"bcrypt_rounds": BCRYPT_ROUNDS, "workers": AUTH_WORKERS}
+    for operation, samples in _timings.items():
+        ordered = sorted(samples)
+        if not ordered:
+            report[operation] = {"count": 0}
+            continue
+        report[operation] = {
+            "count": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+    return report
+
+class VerifiedTokenCache:
+    """
+    LRU of JWTs whose signature has already been checked, keyed by a hash of the token.
+    Entries are only served until the token's own `exp`, so expiry is still enforced.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def put(self, token, user_id, expires_at):
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+verified_tokens = VerifiedTokenCache()
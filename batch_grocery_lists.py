@@ -0,0 +1,173 @@
+"""
+Generate grocery lists for many preference sets at once (nightly regeneration jobs).
+
+Identical item queries across preference sets with the same store preference are resolved once:
+queries are embedded and searched in large batches (restricted to the preferred store, like
+/generate_grocery_list/), candidates are fetched with one $in query per chunk, OpenAI reranks
+run on a worker pool through the shared rerank cache, and the finished lists are written with
+insert_many.
+
+Usage:
+    python batch_grocery_lists.py preferences.jsonl [--batch-size 256] [--workers 8]
+
+Each line of the input is one preference set: the /generate_grocery_list/ body plus "user_id".
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from main import model
+from metrics import timed
+from store_shards import item_shards
+from lexical_index import item_lexical_index, reciprocal_rank_fusion
+from item_catalog import item_catalog
+from list_documents import compact_store_lists, resolved_item_ids
+from openai_grocerylist import (
+    item_index, grocery_lists_collection, rerank, build_grocery_list, resolution_trace_document, HYBRID_SEARCH
+)
+
+EMBED_BATCH_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "256"))
+RERANK_WORKERS = int(os.getenv("BATCH_RERANK_WORKERS", "8"))
+INSERT_BATCH_SIZE = 1000
+CANDIDATES_PER_QUERY = 10
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _vector_hits(embeddings, stores):
+    # Per-store shards when they cover the stores (as vector_search_ids does), else one batched search
+    if item_shards.covers(stores):
+        with timed("faiss_search"):
+            return [[item_id for _, item_id, _ in item_shards.search(embedding, k=CANDIDATES_PER_QUERY, stores=stores)]
+                    for embedding in embeddings]
+    snapshot = item_index.current()
+    with timed("faiss_search"):
+        _, indices = snapshot.index.search(embeddings, CANDIDATES_PER_QUERY)
+    return [[snapshot.ids[idx] for idx in row if 0 <= idx < len(snapshot.ids)] for row in indices]
+
+def resolve_queries(queries, stores=None, batch_size=EMBED_BATCH_SIZE, workers=RERANK_WORKERS, progress=print):
+    """
+    Resolve unique queries to their best matching item, searching only `stores` if given. Returns
+    ({query: item or None}, {query: resolution trace entry}).
+    """
+    candidates = {}
+    confident = set()
+    for chunk in _chunks(queries, batch_size):
+        with timed("embedding"):
+            embeddings = np.asarray(model.encode(chunk, batch_size=batch_size), dtype=np.float32)
+
+        hits = {}
+        for query, vector_ids in zip(chunk, _vector_hits(embeddings, stores)):
+            if not HYBRID_SEARCH:
+                hits[query] = vector_ids
+                continue
+            with timed("lexical_search"):
+                lexical_ids = [item_id for item_id, _ in
+                               item_lexical_index.search(query, k=CANDIDATES_PER_QUERY, stores=stores)]
+            hits[query] = [item_id for item_id, _ in
+                           reciprocal_rank_fusion(vector_ids, lexical_ids, limit=CANDIDATES_PER_QUERY)]
+            if vector_ids and lexical_ids and vector_ids[0] == lexical_ids[0]:
+                confident.add(query)
+
+        # Candidates come from the in-memory catalog; only ids it lacks go to MongoDB, in one round trip
+        ids = {item_id for query in chunk for item_id in hits[query]}
+        with timed("item_fetch"):
+            items = item_catalog.items(ids)
+        for query in chunk:
+            candidates[query] = [items[item_id] for item_id in hits[query] if item_id in items]
+        progress(f"Searched {len(candidates)}/{len(queries)} unique queries")
+
+    # Both retrievers agree on the best item: no rerank needed
+    resolved = {query: candidates[query][0] for query in confident if candidates[query]}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(rerank, query, candidates[query]): query
+                   for query in queries if query not in resolved}
+        for done, future in enumerate(as_completed(futures), 1):
+            resolved[futures[future]] = future.result()
+            if done % 100 == 0 or done == len(futures):
+                progress(f"Reranked {done}/{len(futures)} unique queries")
+
+    trace = {query: {"query": query, "chosen_id": resolved[query]["_id"] if resolved.get(query) else None}
+             for query in queries}
+    return resolved, trace
+
+def generate_grocery_lists_batch(preference_sets, batch_size=EMBED_BATCH_SIZE, workers=RERANK_WORKERS,
+                                 progress=print):
+    """
+    Generate and store one grocery list per preference set. Returns a summary with the inserted
+    ids (in input order) and throughput.
+    """
+    started = time.perf_counter()
+    requested_items = sum(len(preferences["Grocery_items"]) for preferences in preference_sets)
+    # Queries are grouped by store preference: a preferred store is the only one searched
+    groups = {}
+    for preferences in preference_sets:
+        groups.setdefault(preferences.get("Store_preference") or None, {}).update(
+            dict.fromkeys(preferences["Grocery_items"])
+        )
+    unique_queries = sum(len(queries) for queries in groups.values())
+    progress(f"{len(preference_sets)} preference sets, {requested_items} items, {unique_queries} unique queries")
+
+    resolved, trace = {}, {}
+    for store, queries in groups.items():
+        stores = [store] if store else None
+        resolved[store], trace[store] = resolve_queries(
+            list(queries), stores=stores, batch_size=batch_size, workers=workers, progress=progress
+        )
+
+    documents = []
+    item_ids = resolved_item_ids(item for group in resolved.values() for item in group.values())
+    created_at = datetime.utcnow()
+    for preferences in preference_sets:
+        store = preferences.get("Store_preference") or None
+        grocery_list = compact_store_lists(build_grocery_list(preferences, resolved[store]), item_ids)
+        grocery_list["resolution_trace"] = resolution_trace_document(
+            preferences, [store] if store else None,
+            [trace[store][request] for request in dict.fromkeys(preferences["Grocery_items"])]
+        )
+        grocery_list["user_id"] = preferences.get("user_id")
+        grocery_list["created_at"] = created_at
+        if preferences.get("list_name"):
+            grocery_list["list_name"] = preferences["list_name"]
+        documents.append(grocery_list)
+
+    inserted_ids = []
+    for chunk in _chunks(documents, INSERT_BATCH_SIZE):
+        with timed("db_write"):
+            inserted_ids.extend(grocery_lists_collection.insert_many(chunk).inserted_ids)
+        progress(f"Stored {len(inserted_ids)}/{len(documents)} grocery lists")
+
+    seconds = time.perf_counter() - started
+    summary = {
+        "lists": len(documents),
+        "items": requested_items,
+        "unique_queries": unique_queries,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(requested_items / seconds, 1) if seconds else None,
+        "inserted_ids": [str(inserted_id) for inserted_id in inserted_ids],
+    }
+    progress(f"Generated {summary['lists']} lists ({summary['items']} items) in {summary['seconds']}s, "
+             f"{summary['items_per_second']} items/s")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON lines file of preference sets ('-' for stdin)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=RERANK_WORKERS)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    with source:
+        preference_sets = [json.loads(line) for line in source if line.strip()]
+    summary = generate_grocery_lists_batch(preference_sets, batch_size=args.batch_size, workers=args.workers)
+    summary.pop("inserted_ids")
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
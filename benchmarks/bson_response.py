@@ -0,0 +1,72 @@
+"""
+Compare response encoding for a user's grocery list history.
+
+"default" is what the handlers used to do: stringify _id in a Python loop, then let FastAPI run
+jsonable_encoder and the stdlib JSONResponse. "MongoJSONResponse" serializes the raw documents.
+
+Run from the project root:
+    python -m benchmarks.bson_response --lists 500
+"""
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from statistics import median
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from bson_response import MongoJSONResponse
+
+def synthetic_history(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    history = []
+    for i in range(count):
+        items = [
+            {"Item_name": f"Item {rng.randint(1, 5000)}", "Price": round(rng.uniform(0.5, 20), 2), "item_id": ObjectId()}
+            for _ in range(rng.randint(5, 25))
+        ]
+        history.append({
+            "_id": ObjectId(),
+            "list_name": f"Weekly list {i}",
+            "user_id": "67044483b9c2ac3499945950",
+            "created_at": start + timedelta(hours=i),
+            "Trader Joe's": {"items": items, "Total_Cost": round(sum(item["Price"] for item in items), 2)},
+            "total_cost": Decimal128(str(round(rng.uniform(10, 100), 2))),
+        })
+    return history
+
+def encode_default(history):
+    # The old path; nested ObjectIds/Decimal128 need a custom encoder for jsonable_encoder to cope at all
+    items = []
+    for list_item in history:
+        list_item = dict(list_item)
+        list_item["_id"] = str(list_item["_id"])
+        items.append(list_item)
+    content = jsonable_encoder(
+        {"grocery_lists": items},
+        custom_encoder={ObjectId: str, Decimal128: lambda value: float(value.to_decimal())},
+    )
+    return JSONResponse(content).body
+
+def encode_mongo(history):
+    return MongoJSONResponse({"grocery_lists": history}).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lists", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    history = synthetic_history(args.lists)
+    for label, encode in [("default", encode_default), ("MongoJSONResponse", encode_mongo)]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = encode(history)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<20} median {median(timings):8.2f} ms   {len(body) / 1024:8.1f} KiB")
+
+if __name__ == "__main__":
+    main()
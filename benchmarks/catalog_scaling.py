@@ -0,0 +1,140 @@
+"""
+How the item search pipeline scales with catalog size and FAISS index type.
+
+For every catalog size and index type this reports index build time, index memory, process
+peak RSS growth and query latency percentiles for:
+- search:   FAISS top-k only
+- pipeline: FAISS + per-hit hydration + is_item_valid, as in search_items_by_query_faiss
+            (per-hit find_one against --mongo-uri if given, otherwise an in-memory id map that
+            stands in for an indexed _id lookup; skipped above --hydrate-max items)
+
+Run from the project root:
+    python -m benchmarks.catalog_scaling --sizes 10000 100000 --index-types flat ivf hnsw
+    python -m benchmarks.catalog_scaling --sizes 1000000 --dimension 384 --index-types ivf hnsw
+"""
+import time
+import argparse
+import resource
+import numpy as np
+from bson import ObjectId
+from benchmarks.synthetic_catalog import generate_items, random_embeddings, model_embeddings, query_vectors
+
+def build_index(index_type, embeddings):
+    import faiss
+
+    dimension = embeddings.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "ivf":
+        nlist = max(1, min(4096, int(4 * np.sqrt(len(embeddings)))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+        sample = embeddings[np.random.default_rng(0).choice(len(embeddings), min(len(embeddings), nlist * 40), replace=False)]
+        index.train(sample)
+        index.nprobe = 16
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, 32)
+        index.hnsw.efSearch = 64
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+    index.add(embeddings)
+    return index
+
+def rss_mb():
+    # Peak resident set size; ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentiles(timings):
+    ordered = np.sort(np.asarray(timings) * 1000)
+    return {p: float(np.percentile(ordered, p)) for p in (50, 95, 99)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--index-types", nargs="+", default=["flat", "ivf", "hnsw"])
+    parser.add_argument("--dimension", type=int,
+                        help="random vectors only (default 768); the encoders have a fixed dimension")
+    parser.add_argument("--embeddings", choices=["random", "hashing", "model"], default="random",
+                        help="random vectors, the benchmark hashing embedder, or all-MPNet-base-v2")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--hydrate-max", type=int, default=100_000)
+    parser.add_argument("--mongo-uri", help="local MongoDB for real per-hit find_one hydration")
+    args = parser.parse_args()
+
+    # Stand-ins for Mongo/OpenAI/the model, and the real is_item_valid
+    from benchmarks.harness import boot_app, HashingEmbedder
+    boot_app(real_model=args.embeddings == "model")
+    from openai_grocerylist import is_item_valid
+
+    collection = None
+    if args.mongo_uri:
+        import pymongo
+        # pymongo.MongoClient is swapped for the in-memory stand-in by boot_app; use the real class
+        collection = pymongo.mongo_client.MongoClient(args.mongo_uri)["catalog-scaling"]["items"]
+
+    encoder = None
+    if args.embeddings == "hashing":
+        encoder = HashingEmbedder()
+    elif args.embeddings == "model":
+        # boot_app loaded the real model into main
+        from main import model as encoder
+    if encoder is not None and args.dimension not in (None, encoder.get_sentence_embedding_dimension()):
+        parser.error(f"--dimension {args.dimension} does not match the {args.embeddings} encoder "
+                     f"({encoder.get_sentence_embedding_dimension()}); omit it")
+
+    header = f"{'items':>9} {'index':<6} {'build s':>8} {'index MB':>9} {'peak +MB':>8} " \
+             f"{'search p50/p95/p99 ms':>24} {'pipeline p50/p95/p99 ms':>26}"
+    print(header)
+    print("-" * len(header))
+
+    for size in args.sizes:
+        items = list(generate_items(size))
+        if encoder is None:
+            embeddings = random_embeddings(size, args.dimension or 768)
+        else:
+            embeddings = model_embeddings(items, encoder)
+        queries = query_vectors(embeddings, args.queries)
+
+        ids = None
+        if size <= args.hydrate_max:
+            for item in items:
+                item["_id"] = ObjectId()
+            ids = [str(item["_id"]) for item in items]
+            if collection is not None:
+                collection.delete_many({})
+                collection.insert_many(items)
+                find_one = collection.find_one
+            else:
+                by_id = {item["_id"]: item for item in items}
+                find_one = lambda query: by_id.get(query["_id"])
+
+        for index_type in args.index_types:
+            import faiss
+
+            rss_before = rss_mb()
+            start = time.perf_counter()
+            index = build_index(index_type, embeddings)
+            build_seconds = time.perf_counter() - start
+            index_mb = len(faiss.serialize_index(index)) / 2 ** 20
+            rss_growth = rss_mb() - rss_before
+
+            search_timings, pipeline_timings = [], []
+            for query in queries:
+                start = time.perf_counter()
+                _, indices = index.search(query[None, :], args.top_k)
+                search_timings.append(time.perf_counter() - start)
+
+                if ids is not None:
+                    hits = [find_one({"_id": ObjectId(ids[idx])}) for idx in indices[0] if idx != -1]
+                    [item for item in hits if item and is_item_valid(item, "vegan", ["peanuts"])]
+                    pipeline_timings.append(time.perf_counter() - start)
+
+            search = percentiles(search_timings)
+            pipeline = "skipped" if not pipeline_timings else "/".join(
+                f"{value:.2f}" for value in percentiles(pipeline_timings).values())
+            print(f"{size:>9} {index_type:<6} {build_seconds:>8.2f} {index_mb:>9.1f} {rss_growth:>8.1f} "
+                  f"{'/'.join(f'{value:.3f}' for value in search.values()):>24} {pipeline:>26}")
+            del index
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Time every API endpoint against the stand-ins in benchmarks.harness and compare with a stored baseline.
+
+Run from the project root:
+    python -m benchmarks.endpoints                      # compare with benchmarks/baseline.json
+    python -m benchmarks.endpoints --save-baseline      # record a new baseline
+    python -m benchmarks.endpoints --openai-latency 0.5 --threshold 0.25
+
+Exits with status 1 if any endpoint returns a non-2xx status (those endpoints are not timed against
+the baseline) or if any endpoint's median is more than --threshold slower than the baseline.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from statistics import median, quantiles
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def endpoint_cases(client, context):
+    """
+    (name, method, url, kwargs) for each endpoint. Setup requests (register/login) run first so
+    authenticated cases have a token.
+    """
+    email = f"bench-{time.time_ns()}@example.com"
+    client.post("/register/", json={"first_name": "Bench", "email": email, "password": "bench-password"})
+    token = client.post("/login/", json={"email": email, "password": "bench-password"}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+    preferences = {
+        "list_name": "Benchmark list", "Budget": 40.0, "Grocery_items": ["pizza", "chips", "juice"],
+        "Dietary_preferences": "none", "Allergies": [], "Store_preference": None,
+    }
+    recipe_preferences = {"Budget": 30.0, "Dietary_preferences": "none", "Allergies": []}
+    counter = iter(range(10 ** 9))
+
+    return [
+        ("register", "post", "/register/", lambda: {"json": {
+            "first_name": "Bench", "email": f"bench-{time.time_ns()}@example.com", "password": "bench-password"}}),
+        ("login", "post", "/login/", lambda: {"json": {"email": email, "password": "bench-password"}}),
+        ("items", "get", "/items/", lambda: {}),
+        ("stores", "get", "/stores/", lambda: {}),
+        ("generate_grocery_list", "post", "/generate_grocery_list/", lambda: {"json": preferences, "headers": auth}),
+        ("grocery_lists", "get", "/grocery_lists", lambda: {"headers": auth}),
+        ("recipe_lists", "get", "/recipe_lists/?list_name=Benchmark%20list", lambda: {}),
+        ("generate_recipe", "post", "/generate_recipe/", lambda: {"json": {"recipe_prompt": "veggie pasta"}}),
+        ("generate_recipe_with_grocery_list", "post", "/generate_recipe_with_grocery_list", lambda: {"json": {
+            "recipe_name": "Tomato Garlic Pasta", "user_preferences": recipe_preferences}, "headers": auth}),
+        ("recipe_by_name", "get", "/recipes/garlic pasta/", lambda: {}),
+        ("recipe_search", "get", "/recipes/search?q=quick vegan dinner", lambda: {}),
+        ("recipe_name_search", "get", "/recipes/name_search?q=pasta", lambda: {}),
+        ("recipe_autocomplete", "get", "/recipes/autocomplete?prefix=on", lambda: {}),
+        ("save_recipe", "post", "/recipes/save", lambda: {"json": {
+            "recipe_name": f"Bench recipe {next(counter)}", "ingredients": ["onion"], "instructions": ["Cook."],
+            "cooking_time": 10, "servings": 2}, "headers": auth}),
+        ("saved_recipes", "get", "/recipes/saved", lambda: {"headers": auth}),
+        ("user_by_email", "get", f"/api/user?user_email={email}", lambda: {}),
+        ("metrics", "get", "/metrics", lambda: {}),
+    ]
+
+def run_suite(client, context, iterations, warmup):
+    results = {}
+    for name, method, url, make_kwargs in endpoint_cases(client, context):
+        request = getattr(client, method)
+        for _ in range(warmup):
+            request(url, **make_kwargs())
+        timings, statuses = [], set()
+        for _ in range(iterations):
+            kwargs = make_kwargs()
+            start = time.perf_counter()
+            response = request(url, **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses.add(response.status_code)
+        p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        results[name] = {"median_ms": round(median(timings), 3), "p95_ms": round(p95, 3), "status": sorted(statuses)}
+        failed = "   FAILED" if not all(200 <= code < 300 for code in statuses) else ""
+        print(f"{name:<36} median {median(timings):9.2f} ms   p95 {p95:9.2f} ms   status {sorted(statuses)}{failed}")
+    return results
+
+def failed_endpoints(results):
+    # An error response is usually much faster than real work; its timing is not a result
+    return [name for name, result in results.items() if not all(200 <= code < 300 for code in result["status"])]
+
+def compare(results, baseline, threshold, min_delta_ms):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous["median_ms"]:
+            continue
+        change = result["median_ms"] / previous["median_ms"] - 1
+        # Ignore sub-millisecond jitter on the fast endpoints
+        if change > threshold and result["median_ms"] - previous["median_ms"] > min_delta_ms:
+            regressions.append((name, previous["median_ms"], result["median_ms"], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="seconds added to every fake OpenAI call")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--mongo-uri", help="local MongoDB to use instead of the in-memory stand-in")
+    parser.add_argument("--real-model", action="store_true", help="use all-MPNet-base-v2 instead of the hashing embedder")
+    args = parser.parse_args()
+
+    from benchmarks.harness import boot_app
+    app, context = boot_app(openai_latency=args.openai_latency, mongo_uri=args.mongo_uri, real_model=args.real_model)
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        results = run_suite(client, context, args.iterations, args.warmup)
+    context["fake_openai"].stop()
+
+    failed = failed_endpoints(results)
+    if failed:
+        print(f"\nNon-2xx responses from {', '.join(failed)}; excluded from the baseline and the comparison.")
+        results = {name: result for name, result in results.items() if name not in failed}
+
+    run = {
+        "results": results,
+        "config": {"iterations": args.iterations, "openai_latency": args.openai_latency,
+                   "real_model": args.real_model, "mongo": "local" if args.mongo_uri else "in-memory"},
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+        return 1 if failed else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != run["config"]:
+        print(f"\nWarning: baseline was recorded with {baseline.get('config')}, this run used {run['config']}.")
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for name, before, after, change in regressions:
+            print(f"  {name}: {before:.2f} ms -> {after:.2f} ms (+{change:.0%})")
+        return 1
+    print(f"\nNo endpoint regressed beyond {args.threshold:.0%} of the baseline.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Deterministic stand-in for the OpenAI chat completions API.
+
+Point the openai client at it with OPENAI_BASE_URL=<server.base_url>. Every response is
+delayed by `latency` seconds to mimic GPT-4 round trips:
+- item selection prompts ("Select the best matching item") get the first listed Item_name back
+- recipe prompts get a small fixed JSON recipe
+"""
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_RECIPE = {
+    "name": "Benchmark Veggie Pasta",
+    "ingredients": ["200g pasta", "1 onion, diced", "2 cloves garlic", "1 can tomatoes", "olive oil"],
+    "simplified_ingredients": ["pasta", "onion", "garlic", "tomatoes", "olive oil"],
+    "instructions": ["Boil the pasta.", "Fry onion and garlic in olive oil.", "Add tomatoes and simmer.", "Combine."],
+    "prep_time": "10 minutes",
+    "cook_time": "20 minutes",
+    "total_time": "30 minutes",
+}
+
+_item_pattern = re.compile(r"^Item: (.*), Price: ")
+
+def _reply(messages):
+    for message in messages:
+        match = _item_pattern.match(message.get("content", ""))
+        if match:
+            return match.group(1)
+    return json.dumps(FAKE_RECIPE)
+
+class FakeOpenAIServer:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                content = _reply(body.get("messages", []))
+                payload = json.dumps({
+                    "id": f"chatcmpl-fake-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
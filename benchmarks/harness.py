@@ -0,0 +1,186 @@
+"""
+Boot api.app against stand-ins so benchmarks run without Atlas, OpenAI or the MPNet download:
+- MongoDB: a shared in-memory mongomock client (or a real server via --mongo-uri)
+- OpenAI: benchmarks.fake_openai with configurable latency
+- Embeddings: a deterministic hashed bag-of-words embedder (or the real model via --real-model)
+- FAISS: a small fixture index built from FIXTURE_ITEMS in a temporary working directory
+"""
+import os
+import sys
+import types
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+from bson import ObjectId
+from benchmarks.fake_openai import FakeOpenAIServer
+
+EMBEDDING_DIMENSION = 768
+
+# The app is imported after chdir'ing into a scratch directory, so make the repo importable explicitly
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+FIXTURE_ITEMS = [
+    ("Trader Joe's", "Margherita Pizza", 5.49, ["wheat flour", "tomatoes", "mozzarella", "basil"]),
+    ("Trader Joe's", "Vegan Cauliflower Pizza", 6.99, ["cauliflower", "tomatoes", "olive oil"]),
+    ("Trader Joe's", "Sea Salt Potato Chips", 2.49, ["potatoes", "sunflower oil", "sea salt"]),
+    ("Trader Joe's", "Organic Orange Juice", 3.99, ["oranges"]),
+    ("Trader Joe's", "Spaghetti Pasta", 1.29, ["durum wheat semolina"]),
+    ("Trader Joe's", "Yellow Onions", 1.99, ["onion"]),
+    ("Trader Joe's", "Garlic Bulbs", 0.99, ["garlic"]),
+    ("Trader Joe's", "Crushed Tomatoes", 1.79, ["tomatoes", "salt"]),
+    ("Trader Joe's", "Extra Virgin Olive Oil", 7.99, ["olive oil"]),
+    ("Trader Joe's", "Oat Milk", 3.49, ["oats", "water", "rapeseed oil"]),
+    ("Whole Foods Market", "Thin Crust Cheese Pizza", 7.99, ["wheat flour", "tomatoes", "mozzarella"]),
+    ("Whole Foods Market", "Kettle Cooked Chips", 3.29, ["potatoes", "avocado oil", "salt"]),
+    ("Whole Foods Market", "Cold Pressed Apple Juice", 4.99, ["apples"]),
+    ("Whole Foods Market", "Organic Penne Pasta", 1.99, ["durum wheat semolina"]),
+    ("Whole Foods Market", "Red Onions", 2.29, ["onion"]),
+    ("Whole Foods Market", "Peeled Garlic", 2.99, ["garlic"]),
+    ("Whole Foods Market", "Diced Tomatoes", 1.49, ["tomatoes", "citric acid"]),
+    ("Whole Foods Market", "Organic Olive Oil", 9.99, ["olive oil"]),
+    ("Whole Foods Market", "Almond Milk", 3.79, ["almonds", "water"]),
+    ("Whole Foods Market", "Chicken Breast", 8.99, ["chicken"]),
+]
+
+FIXTURE_RECIPES = [
+    {"name": "Tomato Garlic Pasta", "simplified_ingredients": ["pasta", "tomatoes", "garlic", "olive oil"]},
+    {"name": "Onion Soup", "simplified_ingredients": ["onion", "olive oil", "garlic"]},
+    {"name": "Quick Vegan Pizza", "simplified_ingredients": ["pizza dough", "tomatoes", "olive oil"]},
+]
+
+class HashingEmbedder:
+    """
+    Deterministic stand-in for SentenceTransformer: hashed bag of words, L2-normalized.
+    Texts sharing words land close together, which is enough for realistic FAISS work.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.dimension = EMBEDDING_DIMENSION
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().replace(",", " ").replace(".", " ").split():
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            return self._embed(texts)
+        return np.stack([self._embed(text) for text in texts]) if texts else np.zeros((0, self.dimension), np.float32)
+
+def _install_fake_embedder():
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = HashingEmbedder
+    sys.modules["sentence_transformers"] = module
+
+def _bulk_write(collection, requests, ordered=True, **kwargs):
+    # mongomock's bulk_write breaks on the `sort` argument newer pymongo passes for UpdateOne; apply one by one
+    result = types.SimpleNamespace(inserted_count=0, matched_count=0, modified_count=0, deleted_count=0,
+                                   upserted_count=0, upserted_ids={})
+    for position, request in enumerate(requests):
+        kind = type(request).__name__
+        if kind == "InsertOne":
+            collection.insert_one(request._doc)
+            result.inserted_count += 1
+        elif kind in ("DeleteOne", "DeleteMany"):
+            delete = collection.delete_one if kind == "DeleteOne" else collection.delete_many
+            result.deleted_count += delete(request._filter).deleted_count
+        else:
+            write = {"UpdateOne": collection.update_one, "UpdateMany": collection.update_many,
+                     "ReplaceOne": collection.replace_one}[kind]
+            outcome = write(request._filter, request._doc, upsert=request._upsert)
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            if outcome.upserted_id is not None:
+                result.upserted_ids[position] = outcome.upserted_id
+                result.upserted_count += 1
+    return result
+
+def _install_mongomock():
+    import mongomock
+    import pymongo
+
+    mongomock.collection.Collection.bulk_write = _bulk_write
+    shared_client = mongomock.MongoClient()
+    # Every module creates its own MongoClient; hand them all the same in-memory server
+    pymongo.MongoClient = lambda *args, **kwargs: shared_client
+    return shared_client
+
+def seed_database(db, embedder):
+    """
+    Insert fixture stores, items (with embeddings) and recipes; return the FAISS index and ids.
+    """
+    import faiss
+
+    for collection in ("stores", "items", "recipes", "users", "grocery_lists"):
+        db[collection].delete_many({})
+
+    db["stores"].insert_many([{"Store_name": "Trader Joe's"}, {"Store_name": "Whole Foods Market"}])
+
+    items = []
+    for store, name, price, ingredients in FIXTURE_ITEMS:
+        embedding = np.asarray(embedder.encode(name), dtype=np.float32)
+        items.append({
+            "_id": ObjectId(), "Item_name": name, "Store_name": store, "Price": price,
+            "Ingredients": ingredients, "Simplified Ingredients": ingredients,
+            "embedding": pickle.dumps(embedding.tolist()),
+        })
+    db["items"].insert_many(items)
+    db["recipes"].insert_many([dict(recipe, ingredients=recipe["simplified_ingredients"]) for recipe in FIXTURE_RECIPES])
+
+    embeddings = np.stack([pickle.loads(item["embedding"]) for item in items]).astype("float32")
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    return index, [str(item["_id"]) for item in items]
+
+def boot_app(openai_latency=0.0, mongo_uri=None, real_model=False, workdir=None):
+    """
+    Prepare the stand-ins, import api and return (app, context). Must be called before anything
+    imports main/api, because those modules connect and load indexes at import time.
+    """
+    import faiss
+
+    workdir = workdir or tempfile.mkdtemp(prefix="chopnshop-bench-")
+    fake_openai = FakeOpenAIServer(latency=openai_latency).start()
+    os.environ["OPENAI_BASE_URL"] = fake_openai.base_url
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+    if mongo_uri:
+        import pymongo
+        # Seeding wipes the chop-n-shop collections, so never allow a remote cluster here
+        host = mongo_uri.split("://", 1)[-1].split("@")[-1].split("/")[0]
+        if not host.startswith(("localhost", "127.0.0.1")):
+            raise ValueError(f"Refusing to seed non-local MongoDB at {host}; use a throwaway local server.")
+        os.environ["MONGO_URI"] = mongo_uri
+        db = pymongo.MongoClient(mongo_uri)["chop-n-shop"]
+    else:
+        db = _install_mongomock()["chop-n-shop"]
+    if real_model:
+        from sentence_transformers import SentenceTransformer
+        embedder = SentenceTransformer("all-MPNet-base-v2")
+    else:
+        _install_fake_embedder()
+        embedder = HashingEmbedder()
+
+    # The app reads its index files from the working directory
+    index, ids = seed_database(db, embedder)
+    os.chdir(workdir)
+    faiss.write_index(index, "faiss_index_file.index")
+    with open("ids_list.pkl", "wb") as f:
+        pickle.dump(ids, f)
+
+    # api.py also uses load_dotenv(override=True); keep a stray .env from pointing us elsewhere
+    import dotenv
+    dotenv.load_dotenv = lambda *args, **kwargs: False
+
+    import api
+    return api.app, {"db": db, "fake_openai": fake_openai, "workdir": workdir}
@@ -0,0 +1,127 @@
+"""
+Compare legacy (embedded item copies) and compact (item references) grocery list documents:
+BSON size, write latency of one generation, and the cost of hydrating a page of lists on read.
+
+"legacy write" is what /generate_grocery_list/ used to do: insert the full list inside
+generate_grocery_list and again in the endpoint. "compact write" is the single insert now, of the
+document generate_grocery_list_document produces: the compact items plus the resolution trace.
+
+Run from the project root:
+    python -m benchmarks.list_storage --lists 2000
+    python -m benchmarks.list_storage --mongo-uri mongodb://localhost:27017
+"""
+import time
+import random
+import argparse
+from statistics import median
+from bson import ObjectId
+from benchmarks.synthetic_catalog import generate_items, STORES
+
+def percentiles(timings):
+    ordered = sorted(timings)
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 for p in (50, 95, 99)}
+
+def synthetic_lists(items, count, seed=42):
+    """
+    Legacy per-store lists ({store: {"items", "Total_Cost"}}) and the (store, name) -> id map.
+    """
+    rng = random.Random(seed)
+    by_store = {}
+    for item in items:
+        by_store.setdefault(item["Store_name"], []).append(item)
+    item_ids = {(item["Store_name"], item["Item_name"]): item["_id"] for item in items}
+    lists = []
+    for i in range(count):
+        document = {"user_id": "67044483b9c2ac3499945950", "list_name": f"Weekly list {i}"}
+        for store in rng.sample(STORES, rng.randint(1, 3)):
+            chosen = rng.sample(by_store[store], rng.randint(3, 12))
+            document[store] = {
+                "items": [{"Item_name": item["Item_name"], "Price": item["Price"]} for item in chosen],
+                "Total_Cost": round(sum(item["Price"] for item in chosen), 2),
+            }
+        lists.append(document)
+    return lists, item_ids
+
+def with_trace(document, legacy, resolution_trace_document):
+    """
+    The compact document as generation stores it: one trace request per item, queried by a
+    shortened item name, with the preferences that produced it.
+    """
+    names = [item["Item_name"] for key, value in legacy.items() if isinstance(value, dict) for item in value["items"]]
+    queries = [" ".join(name.lower().split()[-2:]) for name in names]
+    preferences = {"Budget": 50.0, "Grocery_items": queries, "Dietary_preferences": "vegetarian",
+                   "Allergies": ["peanuts"], "Store_preference": None}
+    trace = [{"query": query, "chosen_id": entry.get("id")} for query, entry in zip(queries, document["items"])]
+    return dict(document, resolution_trace=resolution_trace_document(preferences, None, trace))
+
+def timed_writes(collection, documents, copies):
+    timings = []
+    for document in documents:
+        start = time.perf_counter()
+        for _ in range(copies):
+            collection.insert_one(dict(document))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--lists", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=50, help="lists per hydrated read")
+    parser.add_argument("--mongo-uri", help="local MongoDB for real write latency")
+    args = parser.parse_args()
+
+    # Stand-ins for Mongo/OpenAI/the model so list_documents imports without Atlas
+    from benchmarks.harness import boot_app
+    boot_app()
+    import list_documents
+    from list_documents import compact_store_lists, document_size, hydrate_lists
+    from openai_grocerylist import resolution_trace_document
+    from item_catalog import ItemCatalog
+
+    if args.mongo_uri:
+        import pymongo
+        # pymongo.MongoClient is swapped for the in-memory stand-in by boot_app; use the real class
+        db = pymongo.mongo_client.MongoClient(args.mongo_uri)["list-storage-benchmark"]
+    else:
+        import mongomock
+        db = mongomock.MongoClient()["list-storage-benchmark"]
+    db["items"].delete_many({})
+    db["grocery_lists"].delete_many({})
+
+    items = [dict(item, _id=ObjectId(), embedding=[0.0]) for item in generate_items(args.items)]
+    db["items"].insert_many(items)
+    ids = [str(item["_id"]) for item in items]
+    list_documents.item_catalog = ItemCatalog(db["items"], version_source=lambda: 1).load(lambda: ids)
+
+    legacy, item_ids = synthetic_lists(items, args.lists)
+    compact = [with_trace(compact_store_lists(document, item_ids), document, resolution_trace_document)
+               for document in legacy]
+    legacy_bytes = [document_size(document) for document in legacy]
+    compact_bytes = [document_size(document) for document in compact]
+    trace_bytes = [document_size({"resolution_trace": document["resolution_trace"]}) for document in compact]
+    entries = sum(len(document["items"]) for document in compact)
+    print(f"{args.lists} lists, {entries / args.lists:.1f} items per list")
+    print(f"{'document':<10} {'avg bytes':>10} {'median':>8} {'bytes/item':>11}")
+    for name, sizes in (("legacy", legacy_bytes), ("compact", compact_bytes), ("  trace", trace_bytes)):
+        print(f"{name:<10} {sum(sizes) / len(sizes):>10.0f} {median(sizes):>8.0f} {sum(sizes) / entries:>11.1f}")
+    print(f"size reduction (trace included): {1 - sum(compact_bytes) / sum(legacy_bytes):.1%}")
+
+    print(f"\n{'write':<16} {'p50/p95/p99 ms':>24}")
+    for name, documents, copies in (("legacy x2", legacy, 2), ("compact x1", compact, 1)):
+        db["grocery_lists"].delete_many({})
+        timings = percentiles(timed_writes(db["grocery_lists"], documents, copies))
+        print(f"{name:<16} {'/'.join(f'{value:.3f}' for value in timings.values()):>24}")
+
+    timings = []
+    for start in range(0, len(compact), args.page):
+        page = compact[start:start + args.page]
+        began = time.perf_counter()
+        # The list endpoints leave the trace out with a projection
+        hydrate_lists([{key: value for key, value in document.items() if key != "resolution_trace"}
+                       for document in page])
+        timings.append(time.perf_counter() - began)
+    print(f"{f'hydrate {args.page}':<16} {'/'.join(f'{value:.3f}' for value in percentiles(timings).values()):>24}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Concurrent load test for a running Chop N' Shop API.
+
+Virtual users register and log in once, then loop over weighted scenarios (login, fetching
+lists, generating lists, recipe search, and the GET requests from the Postman collection)
+until the run ends. Every --interval seconds it prints requests/s, error rate and latency
+percentiles for that window, then a per-scenario summary.
+
+Against a server you started yourself (use fake LLM backends, e.g. --serve below):
+    python -m benchmarks.load_test --target http://localhost:8000 --users 50 --duration 60
+
+Or let the script boot api.app with the benchmark stand-ins on a local uvicorn worker:
+    python -m benchmarks.load_test --serve --openai-latency 1.5 --users 50 --duration 60
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+import numpy as np
+import httpx
+
+POSTMAN_COLLECTION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Chop-N-Shop API.postman_collection (2).json"
+)
+
+DEFAULT_WEIGHTS = {
+    "login": 5,
+    "fetch_lists": 25,
+    "fetch_saved_recipes": 10,
+    "generate_list": 5,
+    "generate_recipe_list": 5,
+    "recipe_search": 20,
+    "recipe_autocomplete": 20,
+    "stores": 5,
+}
+POSTMAN_WEIGHT = 10
+
+_document_id = re.compile(r"[0-9a-f]{24}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+def postman_requests(path=POSTMAN_COLLECTION):
+    """
+    GET requests from the Postman collection as (scenario name, path) pairs. Mutating requests
+    are skipped (the load test must not write arbitrary catalog data), and so are requests for a
+    specific document, whose ids come from a developer's database.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        collection = json.load(f)
+
+    requests = []
+
+    def walk(entries):
+        for entry in entries:
+            if "item" in entry:
+                walk(entry["item"])
+                continue
+            request = entry.get("request", {})
+            if request.get("method") != "GET":
+                continue
+            url = request.get("url", {})
+            segments = url.get("path", []) if isinstance(url, dict) else []
+            if any(_document_id.fullmatch(segment) for segment in segments):
+                continue
+            requests.append((f"postman:{entry['name']}", "/" + "/".join(segments)))
+
+    walk(collection.get("item", []))
+    return requests
+
+class VirtualUser:
+    def __init__(self, client, user_number):
+        self.client = client
+        self.email = f"load-{os.getpid()}-{user_number}-{time.time_ns()}@example.com"
+        self.password = "load-test-password"
+        self.headers = {}
+
+    async def setup(self):
+        await self.client.post("/register/", json={"first_name": "Load", "email": self.email, "password": self.password})
+        await self.login()
+
+    async def login(self):
+        response = await self.client.post("/login/", json={"email": self.email, "password": self.password})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def run(self, scenario):
+        if scenario == "login":
+            return await self.login()
+        if scenario == "fetch_lists":
+            return await self.client.get("/grocery_lists", headers=self.headers)
+        if scenario == "fetch_saved_recipes":
+            return await self.client.get("/recipes/saved", headers=self.headers)
+        if scenario == "generate_list":
+            return await self.client.post("/generate_grocery_list/", headers=self.headers, json={
+                "list_name": "Load test list", "Budget": 40.0,
+                "Grocery_items": random.sample(["pizza", "chips", "juice", "pasta", "oat milk", "garlic"], 3),
+                "Dietary_preferences": "none", "Allergies": [], "Store_preference": None,
+            })
+        if scenario == "generate_recipe_list":
+            return await self.client.post("/generate_recipe_with_grocery_list", headers=self.headers, json={
+                "recipe_name": "Tomato Garlic Pasta",
+                "user_preferences": {"Budget": 30.0, "Dietary_preferences": "none", "Allergies": []},
+            })
+        if scenario == "recipe_search":
+            return await self.client.get("/recipes/name_search", params={"q": random.choice(["pasta", "soup", "pizza"])})
+        if scenario == "recipe_autocomplete":
+            return await self.client.get("/recipes/autocomplete", params={"prefix": random.choice(["o", "on", "qu", "to"])})
+        if scenario == "stores":
+            return await self.client.get("/stores/")
+        if scenario.startswith("postman:"):
+            return await self.client.get(self.postman_paths[scenario])
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+async def run_load(target, users, duration, ramp, think_time, weights, postman_paths, timeout):
+    samples = []  # (finished_at, scenario, latency seconds, ok)
+    scenarios, scenario_weights = zip(*weights.items())
+    started_at = time.monotonic()
+    deadline = started_at + duration
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        async def user_loop(user_number):
+            await asyncio.sleep(ramp * user_number / max(1, users))
+            user = VirtualUser(client, user_number)
+            user.postman_paths = postman_paths
+            await user.setup()
+            while time.monotonic() < deadline:
+                scenario = random.choices(scenarios, scenario_weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await user.run(scenario)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples.append((time.monotonic() - started_at, scenario, time.perf_counter() - start, ok))
+                if think_time:
+                    await asyncio.sleep(random.expovariate(1 / think_time))
+
+        await asyncio.gather(*(user_loop(number) for number in range(users)))
+    return samples
+
+def summarize(samples):
+    latencies = np.array([latency for _, _, latency, _ in samples]) * 1000
+    errors = sum(1 for *_, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+    }
+
+def report(samples, duration, interval):
+    print(f"\n{'window':>11} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    windows = defaultdict(list)
+    for sample in samples:
+        windows[int(sample[0] // interval)].append(sample)
+    timeline = []
+    for window in sorted(windows):
+        stats = summarize(windows[window])
+        stats["window_start_s"] = window * interval
+        stats["rps"] = stats["requests"] / interval
+        timeline.append(stats)
+        print(f"{window * interval:>5}-{(window + 1) * interval:<5} {stats['rps']:>8.1f} {stats['error_rate']:>6.1%} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    print(f"\n{'scenario':<32} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample[1]].append(sample)
+    scenarios = {}
+    for scenario, scenario_samples in sorted(by_scenario.items()):
+        stats = scenarios[scenario] = summarize(scenario_samples)
+        print(f"{scenario:<32} {stats['requests']:>8} {stats['error_rate']:>6.1%} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    overall = summarize(samples)
+    overall["rps"] = overall["requests"] / duration
+    print(f"\nTotal: {overall['requests']} requests, {overall['rps']:.1f} req/s, "
+          f"{overall['error_rate']:.1%} errors, p50 {overall['p50_ms']:.1f} ms, p95 {overall['p95_ms']:.1f} ms, "
+          f"p99 {overall['p99_ms']:.1f} ms")
+    return {"overall": overall, "timeline": timeline, "scenarios": scenarios}
+
+def serve_in_background(port, openai_latency):
+    """
+    Boot api.app on the benchmark stand-ins and run it on one uvicorn worker in a thread.
+    """
+    import uvicorn
+    from benchmarks.harness import boot_app
+
+    app, _ = boot_app(openai_latency=openai_latency)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def parse_weights(values, postman_paths):
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update({name: POSTMAN_WEIGHT / max(1, len(postman_paths)) for name in postman_paths})
+    for value in values or []:
+        name, _, weight = value.partition("=")
+        weights[name] = float(weight)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="http://localhost:8000")
+    parser.add_argument("--serve", action="store_true", help="boot api.app with stand-ins on a local uvicorn worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="fake OpenAI latency when using --serve")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between a user's requests")
+    parser.add_argument("--interval", type=int, default=5, help="report window in seconds")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--weight", action="append", help="override a scenario weight, e.g. --weight generate_list=20")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    postman_paths = dict(postman_requests())
+    weights = parse_weights(args.weight, postman_paths)
+
+    server = None
+    target = args.target
+    if args.serve:
+        server, target = serve_in_background(args.port, args.openai_latency)
+
+    print(f"Load testing {target} with {args.users} users for {args.duration:.0f}s")
+    print("Scenario weights: " + ", ".join(f"{name}={weight:g}" for name, weight in weights.items()))
+    samples = asyncio.run(run_load(
+        target, args.users, args.duration, args.ramp, args.think_time, weights, postman_paths, args.timeout
+    ))
+    results = report(samples, args.duration, args.interval)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "weights": weights, **results}, f, indent=2)
+    if server:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark the in-process recipe name index against the old regex scan.
+
+Run from the project root:
+    python -m benchmarks.recipe_search --recipes 100000
+"""
+import re
+import time
+import random
+import argparse
+from statistics import median, quantiles
+from recipe_search import RecipeNameIndex
+
+ADJECTIVES = ["spicy", "creamy", "quick", "easy", "vegan", "roasted", "grilled", "crispy", "classic", "smoky",
+              "lemony", "garlic", "herbed", "sweet", "savory", "rustic", "homemade", "baked", "slow cooked", "healthy"]
+MAINS = ["chicken", "tofu", "salmon", "beef", "lentil", "chickpea", "mushroom", "shrimp", "pork", "halloumi",
+         "eggplant", "cauliflower", "turkey", "black bean", "sweet potato", "spinach", "pumpkin", "cod", "lamb", "tempeh"]
+DISHES = ["curry", "stew", "tacos", "pasta", "salad", "soup", "stir fry", "pizza", "burrito bowl", "risotto",
+          "casserole", "skewers", "sandwich", "ramen", "chili", "pie", "noodles", "wrap", "flatbread", "bake"]
+
+def synthetic_recipes(count, seed=42):
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(MAINS)} {rng.choice(DISHES)}".title()
+        if rng.random() < 0.3:
+            name += f" with {rng.choice(MAINS)}"
+        yield {"_id": f"{i:024x}", "name": name}
+
+def time_calls(function, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(label, timings):
+    p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    print(f"{label:<28} median {median(timings):8.3f} ms   p95 {p95:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    documents = list(synthetic_recipes(args.recipes))
+    rng = random.Random(7)
+    queries = [rng.choice([rng.choice(MAINS), rng.choice(DISHES), f"{rng.choice(MAINS)} {rng.choice(DISHES)}"])
+               for _ in range(args.queries)]
+    prefixes = [query[:rng.randint(1, len(query))] for query in queries]
+
+    index = RecipeNameIndex()
+    start = time.perf_counter()
+    index.build(documents)
+    print(f"Built index over {len(index)} recipes in {time.perf_counter() - start:.2f} s\n")
+
+    # Stand-in for {"$regex": ".*name.*", "$options": "i"} on an unindexed collection
+    def regex_scan(query):
+        pattern = re.compile(f".*{re.escape(query)}.*", re.IGNORECASE)
+        return next((document for document in documents if pattern.match(document["name"])), None)
+
+    # Misses (and rare names) force the regex to scan every document, like a COLLSCAN
+    misses = [f"{query} xyz" for query in queries[:20]]
+    report("regex scan (hit)", time_calls(regex_scan, queries[:20]))
+    report("regex scan (miss)", time_calls(regex_scan, misses))
+    report("find_substring (miss)", time_calls(index.find_substring, misses))
+    report("find_substring", time_calls(index.find_substring, queries))
+    report("ranked search (top 10)", time_calls(index.search, queries))
+    report("autocomplete (top 10)", time_calls(index.autocomplete, prefixes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Synthetic grocery catalogs for scaling benchmarks.
+
+Items look like the real collection (Item_name, Store_name, Price, Ingredients) and come with
+either random unit-length embeddings or embeddings from an encoder (e.g. HashingEmbedder or
+SentenceTransformer), so FAISS index build and query costs can be measured at any size.
+"""
+import random
+import numpy as np
+
+BRANDS = ["Organic", "Classic", "Family Size", "Low Sodium", "Gluten Free", "Vegan", "Extra Virgin", "Wild Caught",
+          "Free Range", "Unsweetened", "Spicy", "Honey Roasted", "Reduced Fat", "Whole Grain", "Fresh", "Frozen"]
+PRODUCTS = {
+    "pizza": ["wheat flour", "tomatoes", "mozzarella", "yeast"],
+    "chips": ["potatoes", "sunflower oil", "salt"],
+    "juice": ["oranges", "water"],
+    "pasta": ["durum wheat semolina"],
+    "oat milk": ["oats", "water", "rapeseed oil"],
+    "almond milk": ["almonds", "water"],
+    "yogurt": ["milk", "live cultures"],
+    "bread": ["wheat flour", "yeast", "salt"],
+    "chicken breast": ["chicken"],
+    "salmon fillet": ["salmon"],
+    "tofu": ["soybeans", "water"],
+    "peanut butter": ["peanuts", "salt"],
+    "granola": ["oats", "honey", "almonds"],
+    "cheddar cheese": ["milk", "salt", "rennet"],
+    "hummus": ["chickpeas", "tahini", "garlic"],
+    "salsa": ["tomatoes", "onion", "jalapeno"],
+    "olive oil": ["olive oil"],
+    "rice": ["rice"],
+    "black beans": ["black beans", "water", "salt"],
+    "ice cream": ["cream", "milk", "sugar"],
+}
+STORES = ["Trader Joe's", "Whole Foods Market", "Wegmans", "Safeway", "Kroger", "Aldi", "Costco", "Target"]
+
+def generate_items(count, stores=STORES, seed=42):
+    """
+    Yield `count` item documents spread across `stores`.
+    """
+    rng = random.Random(seed)
+    products = list(PRODUCTS.items())
+    for i in range(count):
+        product, ingredients = rng.choice(products)
+        brand = rng.choice(BRANDS)
+        yield {
+            "Item_name": f"{brand} {product.title()} {i % 97}",
+            "Store_name": rng.choice(stores),
+            "Price": round(rng.uniform(0.79, 24.99), 2),
+            "Ingredients": list(ingredients),
+            "Calories": rng.randint(10, 600),
+        }
+
+def random_embeddings(count, dimension=768, seed=42, batch_size=100_000):
+    """
+    Unit-length gaussian vectors as a float32 (count, dimension) array.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, batch_size):
+        batch = rng.standard_normal((min(batch_size, count - start), dimension), dtype=np.float32)
+        batch /= np.linalg.norm(batch, axis=1, keepdims=True)
+        embeddings[start:start + len(batch)] = batch
+    return embeddings
+
+def model_embeddings(items, encoder, batch_size=256):
+    """
+    Encode item names with a SentenceTransformer-compatible encoder.
+    """
+    names = [item["Item_name"] for item in items]
+    chunks = [np.asarray(encoder.encode(names[i:i + batch_size], batch_size=batch_size), dtype=np.float32)
+              for i in range(0, len(names), batch_size)]
+    return np.concatenate(chunks) if chunks else np.zeros((0, 768), dtype=np.float32)
+
+def query_vectors(embeddings, count, noise=0.05, seed=7):
+    """
+    Queries near existing items (item vector + small noise), like a user typing a product name.
+    """
+    rng = np.random.default_rng(seed)
+    picks = embeddings[rng.integers(0, len(embeddings), count)]
+    queries = picks + rng.standard_normal(picks.shape, dtype=np.float32) * noise
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
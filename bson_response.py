@@ -0,0 +1,30 @@
+from decimal import Decimal
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+
+# Types orjson doesn't know natively; datetime, dicts, lists and numpy arrays are handled by orjson itself
+def bson_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content):
+    return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class MongoJSONResponse(JSONResponse):
+    """
+    JSON response that serializes MongoDB documents directly: ObjectId (at any depth) becomes
+    its hex string, Decimal128/Decimal become numbers and datetimes use ISO 8601.
+    Returning it from a route skips FastAPI's jsonable_encoder pass entirely.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
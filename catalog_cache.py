@@ -0,0 +1,132 @@
+import gzip
+import time
+import hashlib
+import threading
+from fastapi import Response
+from pymongo import ReturnDocument
+from main import db
+from bson_response import dumps
+
+# Catalog version document shared by every worker; bumped whenever items or stores change
+catalog_meta_collection = db["catalog_meta"]
+CATALOG_VERSION_ID = "catalog"
+
+# Seconds between checks of the shared version, and hard expiry of any cached response
+VERSION_CHECK_SECONDS = 30
+CACHE_TTL_SECONDS = 3600
+
+# Upper bound on cached responses (one per route + page)
+MAX_ENTRIES = 256
+
+# Only bother compressing bodies larger than this
+GZIP_MIN_BYTES = 1024
+
+def get_catalog_version():
+    meta = catalog_meta_collection.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+    return meta["version"] if meta else 0
+
+def bump_catalog_version():
+    """
+    Mark the catalog as changed. Called by the catalog ingest and the incremental indexer;
+    every worker drops its cached catalog responses on its next version check.
+    """
+    meta = catalog_meta_collection.find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": time.time()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    catalog_cache.invalidate(meta["version"])
+    return meta["version"]
+
+class _CachedResponse:
+    def __init__(self, body, headers):
+        self.body = body
+        self.headers = headers
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong ETags are per representation, so the gzipped body gets its own
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        self.created_at = time.monotonic()
+
+class CatalogCache:
+    """
+    In-process cache of serialized catalog responses (items, stores).
+    Entries are keyed by route + query parameters and dropped when the catalog version changes
+    or after CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, version_source=get_catalog_version, ttl=CACHE_TTL_SECONDS, check_interval=VERSION_CHECK_SECONDS):
+        self.version_source = version_source
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.version = None
+        self.checked_at = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, version=None):
+        with self._lock:
+            self._entries = {}
+            if version is not None:
+                self.version = version
+                self.checked_at = time.monotonic()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        try:
+            version = self.version_source()
+        except Exception as e:
+            print(f"Error checking catalog version: {e}")
+            return
+        if version != self.version:
+            self.invalidate(version)
+
+    def get(self, key, producer):
+        """
+        Return the cached entry for key, calling producer() -> (payload, headers) on a miss.
+        """
+        self._check_version()
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry.created_at < self.ttl:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        payload, headers = producer()
+        body = dumps(payload)
+        entry = _CachedResponse(body, headers or {})
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                # Dicts keep insertion order, so this drops the oldest entry
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+    def respond(self, request, key, producer):
+        """
+        Build the HTTP response for a cacheable catalog route: 304 when the client's
+        If-None-Match matches, otherwise the cached body (gzipped if the client accepts it).
+        """
+        entry = self.get(key, producer)
+        use_gzip = entry.gzipped is not None and "gzip" in request.headers.get("accept-encoding", "")
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding", **entry.headers}
+
+        if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status_code=304, headers=headers)
+
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=entry.gzipped, media_type="application/json", headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# Shared cache used by the API
+catalog_cache = CatalogCache()
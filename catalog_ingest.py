@@ -0,0 +1,261 @@
+"""
+Stream a store catalog feed (CSV or JSON lines) into the items collection.
+
+Rows are normalized, upserted on (Store_name, Item_name) with unordered bulk_write batches,
+embedded in batches on a worker pool (only items without an embedding yet), and appended to
+the item FAISS index, which is published as a new version once at the end. Memory stays bounded by
+batch size x workers regardless of feed size.
+
+Usage:
+    python catalog_ingest.py feed.csv --store "Trader Joe's"
+    python catalog_ingest.py feed.jsonl --batch-size 2000 --workers 4
+
+Columns/keys: Item_name, Store_name (or --store), Price, Ingredients (list, or a comma/semicolon
+separated string), Calories (optional).
+"""
+import os
+import re
+import csv
+import sys
+import json
+import time
+import pickle
+import argparse
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from pymongo import UpdateOne
+from main import model, items_collection, stores_collection, load_faiss_index
+from catalog_cache import bump_catalog_version
+from store_shards import item_shards, build_store_shards
+from index_artifacts import (
+    ARTIFACT_DIR, LEGACY_INDEX_FILE, LEGACY_IDS_FILE, current_version, load_artifact, publish_index
+)
+
+BATCH_SIZE = 1000
+EMBED_WORKERS = 4
+
+_whitespace = re.compile(r"\s+")
+_ingredient_separators = re.compile(r"[;,]")
+
+def read_rows(path, fmt=None):
+    """
+    Yield raw rows from a CSV or JSON-lines file (or stdin with path "-") one at a time.
+    """
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    source = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    with source:
+        if fmt == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+def clean_text(value):
+    return _whitespace.sub(" ", str(value)).strip()
+
+def normalize_item(row, default_store=None):
+    """
+    Turn a feed row into an item document, or None if it is unusable.
+    """
+    name = clean_text(row.get("Item_name") or row.get("name") or "")
+    store = clean_text(row.get("Store_name") or default_store or "")
+    if not name or not store:
+        return None
+    try:
+        price = round(float(str(row.get("Price", "")).replace("$", "").replace(",", "").strip()), 2)
+    except ValueError:
+        return None
+
+    ingredients = row.get("Ingredients") or []
+    if isinstance(ingredients, str):
+        ingredients = _ingredient_separators.split(ingredients)
+    ingredients = [clean_text(ingredient) for ingredient in ingredients if clean_text(ingredient)]
+
+    item = {
+        "Item_name": name,
+        "Store_name": store,
+        "Price": price,
+        "Ingredients": ingredients,
+        "Simplified Ingredients": list(dict.fromkeys(ingredient.lower() for ingredient in ingredients)),
+    }
+    calories = row.get("Calories")
+    if calories not in (None, ""):
+        try:
+            item["Calories"] = int(float(calories))
+        except ValueError:
+            pass
+    return item
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _embed(names):
+    return np.asarray(model.encode(names, batch_size=min(len(names), 256)), dtype=np.float32)
+
+class CatalogIngest:
+    def __init__(self, artifact_dir=ARTIFACT_DIR, batch_size=BATCH_SIZE, workers=EMBED_WORKERS, progress=print):
+        self.artifact_dir = artifact_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.progress = progress
+        # Start from the current published version (or the legacy files); the result is a new version
+        self.index, self.ids = None, []
+        version = current_version(artifact_dir)
+        if version:
+            self.index, self.ids, _ = load_artifact(version, artifact_dir)
+        elif os.path.exists(LEGACY_INDEX_FILE) and os.path.exists(LEGACY_IDS_FILE):
+            self.index, self.ids = load_faiss_index(LEGACY_INDEX_FILE, LEGACY_IDS_FILE)
+        self.index_version = None
+        self.rows = self.invalid = self.inserted = self.updated = self.embedded = 0
+        self.stores = set()
+
+    def _existing(self, items):
+        """
+        {(store, name): (_id, has embedding)} for the items of a batch that are already stored.
+        """
+        existing = {}
+        by_store = {}
+        for item in items:
+            by_store.setdefault(item["Store_name"], []).append(item["Item_name"])
+        for store, names in by_store.items():
+            for doc in items_collection.find(
+                {"Store_name": store, "Item_name": {"$in": names}},
+                {"Item_name": 1, "embedded": {"$ne": [{"$type": "$embedding"}, "missing"]}},
+            ):
+                existing[(store, doc["Item_name"])] = (doc["_id"], doc.get("embedded", False))
+        return existing
+
+    def _prepare(self, executor, rows):
+        """
+        Normalize a batch and start embedding the items that need it.
+        """
+        self.rows += len(rows)
+        # Later rows for the same item win within a batch
+        items = {}
+        for row in rows:
+            item = normalize_item(row, self.default_store)
+            if item is None:
+                self.invalid += 1
+                continue
+            items[(item["Store_name"], item["Item_name"])] = item
+        items = list(items.values())
+        existing = self._existing(items) if items else {}
+        to_embed = [item for item in items if not existing.get((item["Store_name"], item["Item_name"]), (None, False))[1]]
+        future = executor.submit(_embed, [item["Item_name"] for item in to_embed]) if to_embed else None
+        return items, existing, to_embed, future
+
+    def _write(self, items, existing, to_embed, future):
+        """
+        Upsert a prepared batch and append its newly embedded items to the FAISS index.
+        """
+        if not items:
+            return
+        embeddings = future.result() if future else np.zeros((0, 0), dtype=np.float32)
+        for item, embedding in zip(to_embed, embeddings):
+            item["embedding"] = pickle.dumps(embedding.tolist())
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"Store_name": item["Store_name"], "Item_name": item["Item_name"]},
+                {"$set": dict(item, updated_at=now), "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
+            for item in items
+        ]
+        result = items_collection.bulk_write(operations, ordered=False)
+        self.inserted += result.upserted_count
+        self.updated += result.matched_count
+        self.stores.update(item["Store_name"] for item in items)
+
+        if to_embed:
+            positions = {id(item): position for position, item in enumerate(items)}
+            new_ids, rows = [], []
+            for row, item in enumerate(to_embed):
+                key = (item["Store_name"], item["Item_name"])
+                item_id = existing[key][0] if key in existing else result.upserted_ids.get(positions[id(item)])
+                # None: an earlier in-flight batch inserted (and indexed) the same item
+                if item_id is not None:
+                    new_ids.append(str(item_id))
+                    rows.append(row)
+            if self.index is None:
+                self.index = faiss.IndexFlatL2(embeddings.shape[1])  # Same metric as main.build_faiss_index
+            self.index.add(embeddings[rows])
+            self.ids.extend(new_ids)
+            self.embedded += len(new_ids)
+
+    def run(self, rows, default_store=None):
+        self.default_store = default_store
+        started = time.perf_counter()
+        # At most `workers` batches are embedding at once; the oldest is written while the rest run
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in batched(rows, self.batch_size):
+                pending.append(self._prepare(executor, batch))
+                if len(pending) >= self.workers:
+                    self._write(*pending.popleft())
+                    self._report(started)
+            while pending:
+                self._write(*pending.popleft())
+                self._report(started)
+
+        for store in self.stores:
+            stores_collection.update_one({"Store_name": store}, {"$setOnInsert": {"Store_name": store}}, upsert=True)
+        if self.embedded:
+            # With per-store shards only the stores in this feed are re-indexed. They go live first, so
+            # workers that swap to the published index (and re-check shards on the swap) see both.
+            if item_shards.available():
+                build_store_shards(sorted(self.stores))
+            self.index_version = publish_index(self.index, self.ids, artifact_dir=self.artifact_dir)["version"]
+        version = bump_catalog_version()
+
+        seconds = time.perf_counter() - started
+        summary = {
+            "rows": self.rows, "invalid": self.invalid, "inserted": self.inserted, "updated": self.updated,
+            "embedded": self.embedded, "stores": sorted(self.stores), "catalog_version": version,
+            "index_version": self.index_version,
+            "seconds": round(seconds, 2), "rows_per_second": round(self.rows / seconds, 1) if seconds else None,
+        }
+        self.progress(f"Ingested {self.rows} rows in {summary['seconds']}s ({summary['rows_per_second']} rows/s): "
+                      f"{self.inserted} new, {self.updated} updated, {self.invalid} invalid, {self.embedded} embedded")
+        return summary
+
+    def _report(self, started):
+        elapsed = time.perf_counter() - started
+        self.progress(f"{self.rows} rows, {self.rows / elapsed:.0f} rows/s "
+                      f"({self.inserted} new, {self.updated} updated, {self.invalid} invalid)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feed", help="CSV or JSON lines file, '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--store", help="Store_name for rows that do not have one")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="concurrent embedding batches")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR, help="where item index versions are published")
+    parser.add_argument("--skip-recipe-matches", action="store_true",
+                        help="do not refresh precomputed recipe ingredient matches afterwards")
+    args = parser.parse_args()
+
+    ingest = CatalogIngest(args.artifact_dir, batch_size=args.batch_size, workers=args.workers)
+    summary = ingest.run(read_rows(args.feed, args.format), default_store=args.store)
+    print(json.dumps(summary))
+
+    if not args.skip_recipe_matches:
+        # Imported only now so it loads the index version that was just published
+        from openai_recipe_grocery_list import refresh_recipe_matches
+        refresh_recipe_matches()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import sys
+import pymongo
+from pymongo.errors import OperationFailure, PyMongoError, ConnectionFailure
+from main import db
+
+# Indexes required by the API's hot queries, keyed by collection name.
+# Each entry is (keys, options); every index gets an explicit name so that
+# re-running ensure_indexes() is a no-op instead of creating duplicates.
+INDEXES = {
+    "users": [
+        ([("email", pymongo.ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "grocery_lists": [
+        # _id is the keyset tiebreaker for paginated history (see pagination.py)
+        ([("user_id", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+         {"name": "user_id_created_at"}),
+        ([("user_id", pymongo.ASCENDING), ("list_name", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING),
+          ("_id", pymongo.DESCENDING)], {"name": "user_id_list_name"}),
+        ([("list_name", pymongo.ASCENDING)], {"name": "list_name"}),
+    ],
+    "items": [
+        # Upsert key of the catalog ingest (catalog_ingest.py)
+        ([("Store_name", pymongo.ASCENDING), ("Item_name", pymongo.ASCENDING)], {"name": "store_name_item_name"}),
+    ],
+    "recipes": [
+        # Also serves lookups by name alone (prefix of the compound key)
+        ([("name", pymongo.ASCENDING), ("user_id", pymongo.ASCENDING)], {"name": "name_user_id"}),
+        ([("user_id", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+         {"name": "user_id_created_at"}),
+    ],
+}
+
+# Indexes from earlier versions of INDEXES, dropped by ensure_indexes() when still present
+OBSOLETE_INDEXES = {
+    "recipes": ["name"],  # duplicated the prefix of name_user_id
+}
+
+# Representative queries used to check that the planner picks up the indexes above
+EXPLAIN_QUERIES = {
+    "users": {"email": "bob@gmail.com"},
+    "grocery_lists": {"user_id": "67044483b9c2ac3499945950"},
+    "recipes": {"name": "Banana Smoothie"},
+    "items": {"Store_name": "Trader Joe's", "Item_name": "Organic Bananas"},
+}
+
+def _key_spec(keys):
+    # The server may report directions as floats (1.0); compare them as ints
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys]
+
+def ensure_indexes(database=db):
+    """
+    Create every declared index. Safe to call repeatedly (e.g. at every startup).
+    Returns a dict of collection name -> list of index names that are in place.
+    """
+    created = {}
+    try:
+        for collection_name, specs in INDEXES.items():
+            collection = database[collection_name]
+            created[collection_name] = []
+            existing = collection.index_information()
+            for name in OBSOLETE_INDEXES.get(collection_name, []):
+                if name in existing:
+                    collection.drop_index(name)
+            for keys, options in specs:
+                current = existing.get(options["name"])
+                if current is not None and _key_spec(current["key"]) != _key_spec(keys):
+                    # Same name as an index from an earlier INDEXES with different keys: rebuild it
+                    print(f"Recreating index {options['name']} on {collection_name} with keys {keys}")
+                    collection.drop_index(options["name"])
+                try:
+                    created[collection_name].append(collection.create_index(keys, **options))
+                except OperationFailure as e:
+                    # Most likely duplicate emails or an index with the same keys under another name
+                    print(f"Could not create index {options['name']} on {collection_name}: {e}")
+    except ConnectionFailure as e:
+        # MongoDB unreachable: start anyway, the indexes are created on the next startup
+        print(f"Could not reach MongoDB to create indexes: {e}")
+    except PyMongoError as e:
+        print(f"Error creating indexes: {e}")
+    return created
+
+def index_usage(database=db):
+    """
+    Report per-index usage counters via $indexStats.
+    """
+    usage = {}
+    for collection_name in INDEXES:
+        stats = database[collection_name].aggregate([{"$indexStats": {}}])
+        usage[collection_name] = {
+            stat["name"]: {"ops": stat["accesses"]["ops"], "since": stat["accesses"]["since"]}
+            for stat in stats
+        }
+    return usage
+
+def explain_query(collection_name, query, database=db):
+    """
+    Return the winning plan stage and index name for a query, so collection scans are easy to spot.
+    """
+    explanation = database[collection_name].find(query).explain()
+    plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+    # Walk down to the leaf stage (IXSCAN / COLLSCAN)
+    while "inputStage" in plan:
+        plan = plan["inputStage"]
+    return {"stage": plan.get("stage"), "index": plan.get("indexName")}
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "create"
+
+    if command == "create":
+        for collection_name, names in ensure_indexes().items():
+            print(f"{collection_name}: {', '.join(names)}")
+    elif command == "stats":
+        for collection_name, stats in index_usage().items():
+            print(f"{collection_name}:")
+            for name, stat in stats.items():
+                print(f"  {name}: {stat['ops']} ops since {stat['since']}")
+    elif command == "explain":
+        for collection_name, query in EXPLAIN_QUERIES.items():
+            plan = explain_query(collection_name, query)
+            print(f"{collection_name} {query}: {plan['stage']} ({plan['index'] or 'no index'})")
+    else:
+        print("Usage: python db_indexes.py [create|stats|explain]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Streaming exports of a user's grocery lists and saved recipes as NDJSON or CSV.
+
+The Mongo cursor is read EXPORT_BATCH_SIZE documents at a time. Each batch is hydrated, encoded
+and yielded as one chunk before the next one is fetched, so memory depends on the batch size and
+not on how much history the user has. Documents come oldest first, in (created_at, _id) order,
+which the user_id_created_at indexes serve.
+"""
+import io
+import csv
+import pymongo
+from bson_response import dumps
+from list_documents import hydrate_lists
+
+EXPORT_BATCH_SIZE = 500
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+GROCERY_LIST_COLUMNS = ["list_id", "list_name", "created_at", "store", "item_name", "price", "quantity", "ingredient"]
+RECIPE_COLUMNS = ["recipe_id", "name", "created_at", "cooking_time", "servings", "ingredients", "instructions",
+                  "dietary_preferences", "allergies"]
+
+def date_range_query(query, created_after=None, created_before=None):
+    # created_after is inclusive, created_before exclusive
+    created_at = {}
+    if created_after:
+        created_at["$gte"] = created_after
+    if created_before:
+        created_at["$lt"] = created_before
+    return {**query, "created_at": created_at} if created_at else dict(query)
+
+def iter_batches(collection, query, projection=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield lists of at most batch_size documents; the driver fetches the same number per round trip.
+    """
+    cursor = collection.find(query, projection).sort(
+        [("created_at", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+    ).batch_size(batch_size)
+    batch = []
+    try:
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        cursor.close()
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(element) for element in value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return "" if value is None else value
+
+def grocery_list_rows(document):
+    """
+    One CSV row per item of a hydrated list, per-store lists and recipe lists alike.
+    """
+    base = [str(document["_id"]), document.get("list_name"), _cell(document.get("created_at"))]
+    for item in document.get("grocery_list") or []:
+        yield base + [item.get("store"), item.get("item_name"), item.get("price"), 1, item.get("ingredient")]
+    for store, value in document.items():
+        if isinstance(value, dict) and isinstance(value.get("items"), list):
+            for item in value["items"]:
+                yield base + [store, item.get("Item_name"), item.get("Price"), item.get("Quantity", 1), None]
+
+def recipe_rows(document):
+    yield [str(document["recipe_id"])] + [_cell(document.get(column)) for column in RECIPE_COLUMNS[1:]]
+
+def _recipe_json(document):
+    # Same field names as GET /recipes/saved
+    recipe = {"recipe_id": document["_id"]}
+    recipe.update((key, value) for key, value in document.items() if key != "_id")
+    return recipe
+
+def _encode(documents, export_format, rows):
+    if export_format == "ndjson":
+        return b"".join(dumps(document) + b"\n" for document in documents)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for document in documents:
+        writer.writerows(rows(document))
+    return buffer.getvalue().encode()
+
+def _header(columns):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+def export_grocery_lists(collection, user_id, export_format="ndjson", created_after=None, created_before=None,
+                         batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the user's grocery lists as NDJSON lines (the GET /grocery_lists shape) or CSV rows.
+    """
+    if export_format == "csv":
+        yield _header(GROCERY_LIST_COLUMNS)
+    query = date_range_query({"user_id": user_id}, created_after, created_before)
+    for batch in iter_batches(collection, query, {"resolution_trace": 0}, batch_size):
+        # One catalog lookup per batch for the item names
+        yield _encode(hydrate_lists(batch), export_format, grocery_list_rows)
+
+def export_saved_recipes(collection, user_id, projection, export_format="ndjson", created_after=None,
+                         created_before=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the user's saved recipes as NDJSON lines (the GET /recipes/saved shape) or CSV rows.
+    """
+    if export_format == "csv":
+        yield _header(RECIPE_COLUMNS)
+    query = date_range_query({"user_id": user_id}, created_after, created_before)
+    for batch in iter_batches(collection, query, projection, batch_size):
+        yield _encode([_recipe_json(document) for document in batch], export_format, recipe_rows)
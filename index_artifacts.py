@@ -0,0 +1,285 @@
+"""
+Versioned item FAISS index artifacts and zero-downtime hot swap.
+
+Each published version is a directory in ARTIFACT_DIR holding index.faiss, ids.pkl and
+manifest.json (model, dimension, item count, SHA-256 checksum). A version is written to a
+temporary directory, fsynced and renamed into place, then made live by atomically replacing the
+CURRENT pointer file, so a worker can never read a half-written index.
+
+Workers hold the live index in a PublishedItemIndex. Every search takes one reference to the
+current snapshot (index + id list) and uses only that; when CURRENT moves, the new version is
+loaded and verified in the background and swapped in with a single assignment (read-copy-update).
+In-flight searches finish on the old snapshot, which is freed once they drop it. Without a
+published version the legacy faiss_index_file.index / ids_list.pkl files are used.
+
+Usage:
+    python index_artifacts.py publish         # build from MongoDB embeddings and publish
+    python index_artifacts.py list
+    python index_artifacts.py rollback <version>
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import tempfile
+import threading
+import faiss
+from main import MODEL_NAME, build_faiss_index, load_faiss_index
+from catalog_cache import bump_catalog_version
+
+ARTIFACT_DIR = os.getenv("FAISS_ARTIFACT_DIR", "faiss_artifacts")
+LEGACY_INDEX_FILE = "faiss_index_file.index"
+LEGACY_IDS_FILE = "ids_list.pkl"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = int(os.getenv("FAISS_KEEP_VERSIONS", "3"))
+
+# Seconds between checks of the CURRENT pointer
+INDEX_CHECK_SECONDS = int(os.getenv("FAISS_INDEX_CHECK_SECONDS", "30"))
+
+class IndexArtifactError(Exception):
+    pass
+
+def file_checksum(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_atomic(path, data):
+    # Write next to the target and rename over it: readers see the old or the new content, never a mix
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def current_version(artifact_dir=ARTIFACT_DIR):
+    try:
+        with open(os.path.join(artifact_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def list_versions(artifact_dir=ARTIFACT_DIR):
+    """
+    Manifests of every published version, oldest first.
+    """
+    if not os.path.isdir(artifact_dir):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(artifact_dir)):
+        path = os.path.join(artifact_dir, name, "manifest.json")
+        if not name.startswith(".") and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return manifests
+
+def publish_index(index, ids, model_name=MODEL_NAME, artifact_dir=ARTIFACT_DIR, keep=KEEP_VERSIONS):
+    """
+    Write index + ids as a new version and make it the current one. Returns its manifest.
+    """
+    if index.ntotal != len(ids):
+        raise IndexArtifactError(f"Index has {index.ntotal} vectors but {len(ids)} ids.")
+    os.makedirs(artifact_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=artifact_dir, prefix=".staging-")
+    try:
+        index_path, ids_path = os.path.join(staging, "index.faiss"), os.path.join(staging, "ids.pkl")
+        faiss.write_index(index, index_path)
+        with open(ids_path, "wb") as f:
+            pickle.dump(ids, f)
+        _fsync(index_path)
+        _fsync(ids_path)
+
+        checksum = file_checksum(index_path, ids_path)
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{checksum[:8]}"
+        manifest = {
+            "version": version,
+            "model": model_name,
+            "dimension": index.d,
+            "count": index.ntotal,
+            "checksum": checksum,
+            "created_at": time.time(),
+        }
+        if os.path.exists(os.path.join(artifact_dir, version)):
+            # Same content published again within the same second: reuse that version
+            shutil.rmtree(staging, ignore_errors=True)
+        else:
+            _write_atomic(os.path.join(staging, "manifest.json"), json.dumps(manifest, indent=2))
+            os.rename(staging, os.path.join(artifact_dir, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _write_atomic(os.path.join(artifact_dir, CURRENT_FILE), version)
+    print(f"Published item index {version} ({manifest['count']} items, dimension {manifest['dimension']}).")
+    prune_versions(artifact_dir, keep)
+    return manifest
+
+def prune_versions(artifact_dir=ARTIFACT_DIR, keep=KEEP_VERSIONS):
+    # Old versions are kept for rollback; the current one is never removed
+    current = current_version(artifact_dir)
+    old = [manifest["version"] for manifest in list_versions(artifact_dir) if manifest["version"] != current]
+    for version in old[:max(0, len(old) - (keep - 1))]:
+        shutil.rmtree(os.path.join(artifact_dir, version), ignore_errors=True)
+
+def set_current(version, artifact_dir=ARTIFACT_DIR):
+    if not os.path.exists(os.path.join(artifact_dir, version, "manifest.json")):
+        raise IndexArtifactError(f"Unknown index version {version}.")
+    _write_atomic(os.path.join(artifact_dir, CURRENT_FILE), version)
+
+def load_artifact(version, artifact_dir=ARTIFACT_DIR, model_name=MODEL_NAME):
+    """
+    Load and verify one published version: (index, ids, manifest).
+    """
+    directory = os.path.join(artifact_dir, version)
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    index_path, ids_path = os.path.join(directory, "index.faiss"), os.path.join(directory, "ids.pkl")
+    if file_checksum(index_path, ids_path) != manifest["checksum"]:
+        raise IndexArtifactError(f"Checksum mismatch for index version {version}.")
+    if manifest["model"] != model_name:
+        raise IndexArtifactError(f"Index version {version} was built with {manifest['model']}, not {model_name}.")
+
+    index = faiss.read_index(index_path)
+    with open(ids_path, "rb") as f:
+        ids = pickle.load(f)
+    if index.d != manifest["dimension"] or index.ntotal != manifest["count"] or len(ids) != manifest["count"]:
+        raise IndexArtifactError(f"Index version {version} does not match its manifest.")
+    return index, ids, manifest
+
+class IndexSnapshot:
+    __slots__ = ("version", "index", "ids", "manifest", "stamp")
+
+    def __init__(self, version, index, ids, manifest):
+        self.version = version
+        self.index = index
+        self.ids = ids
+        self.manifest = manifest
+        # Identifies the index contents the same way in every process; results computed from this
+        # snapshot are stamped with it. Legacy files have no version, so hash their ids instead.
+        self.stamp = version or "legacy-" + hashlib.sha256("\n".join(ids).encode()).hexdigest()[:16]
+
+class PublishedItemIndex:
+    def __init__(self, artifact_dir=ARTIFACT_DIR, check_interval=INDEX_CHECK_SECONDS):
+        self.artifact_dir = artifact_dir
+        self.check_interval = check_interval
+        self.checked_at = 0
+        self.swaps = 0
+        self._snapshot = None
+        self._listeners = []
+        self._rejected = set()  # versions that failed verification, not retried
+        self._loading = threading.Lock()
+
+    def on_swap(self, listener):
+        # Called with the new snapshot after every hot swap (not on the initial load)
+        self._listeners.append(listener)
+
+    def load(self):
+        """
+        Initial load: the current published version, or the legacy index files. Modules sharing
+        the index all call this; only the first call reads the files.
+        """
+        if self._snapshot is not None:
+            return self._snapshot
+        version = current_version(self.artifact_dir)
+        if version:
+            index, ids, manifest = load_artifact(version, self.artifact_dir)
+        else:
+            index, ids = load_faiss_index(LEGACY_INDEX_FILE, LEGACY_IDS_FILE)
+            manifest = None
+        if not index or not ids:
+            raise ValueError("FAISS index or item IDs not loaded successfully. Ensure the files exist.")
+        self._snapshot = IndexSnapshot(version, index, ids, manifest)
+        self.checked_at = time.monotonic()
+        return self._snapshot
+
+    def current(self):
+        """
+        The live snapshot. Callers keep the returned reference for the whole search so index and ids
+        always belong to the same version.
+        """
+        self.refresh_if_stale()
+        return self._snapshot
+
+    def refresh_if_stale(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        version = current_version(self.artifact_dir)
+        if (version and version != self._snapshot.version and version not in self._rejected
+                and not self._loading.locked()):
+            threading.Thread(target=self.swap, args=(version,), name="item-index-swap", daemon=True).start()
+
+    def swap(self, version):
+        """
+        Load and verify a version, then make it live. A broken version is logged and skipped.
+        """
+        with self._loading:
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            try:
+                index, ids, manifest = load_artifact(version, self.artifact_dir)
+            except Exception as e:
+                print(f"Error loading item index version {version}: {e}")
+                self._rejected.add(version)
+                return None
+            self._snapshot = IndexSnapshot(version, index, ids, manifest)
+            self.swaps += 1
+        print(f"Item index swapped to version {version} ({len(ids)} items).")
+        for listener in self._listeners:
+            try:
+                listener(self._snapshot)
+            except Exception as e:
+                print(f"Error in item index swap listener: {e}")
+        return self._snapshot
+
+    def status(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "version": snapshot.version or "legacy",
+            "count": len(snapshot.ids),
+            "dimension": snapshot.index.d,
+            "swaps": self.swaps,
+        }
+
+item_index = PublishedItemIndex()
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "publish":
+        index, ids = build_faiss_index()
+        publish_index(index, ids)
+        bump_catalog_version()
+    elif command == "list":
+        current = current_version()
+        for manifest in list_versions():
+            marker = "*" if manifest["version"] == current else " "
+            print(f"{marker} {manifest['version']}  {manifest['count']} items  dim {manifest['dimension']}  "
+                  f"{manifest['model']}  sha256:{manifest['checksum'][:12]}")
+    elif command == "rollback" and len(sys.argv) == 3:
+        set_current(sys.argv[2])
+        bump_catalog_version()
+        print(f"Current item index is now {sys.argv[2]}.")
+    else:
+        print("Usage: python index_artifacts.py [publish|list|rollback <version>]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+In-process copy of the item fields the grocery pipeline reads (name, price, store, category,
+ingredients, dietary flags), so search hits are resolved without a MongoDB round trip per item.
+
+Records use __slots__ and are stored in FAISS position order, sharing the id strings of the
+index id list. Store names, categories and ingredient strings are interned, so the catalog costs
+a few hundred bytes per item. A new snapshot is built in the background when the shared catalog
+version changes and swapped in with a single reference assignment: searches keep reading the
+snapshot they started with.
+"""
+import sys
+import time
+import threading
+from bson.objectid import ObjectId
+from main import items_collection
+from catalog_cache import get_catalog_version, VERSION_CHECK_SECONDS
+
+_missing = object()
+
+class CatalogItem:
+    """
+    Compact item record that reads like the MongoDB document for the fields it keeps.
+    """
+
+    __slots__ = ("item_id", "name", "price", "store", "category", "ingredients", "simplified", "diet_mask")
+
+    # Document field -> slot
+    FIELDS = {
+        "Item_name": "name",
+        "Price": "price",
+        "Store_name": "store",
+        "Category": "category",
+        "Ingredients": "ingredients",
+        "Simplified Ingredients": "simplified",
+    }
+
+    def __init__(self, item_id, name, price, store, category, ingredients, simplified, diet_mask):
+        self.item_id = item_id
+        self.name = name
+        self.price = price
+        self.store = store
+        self.category = category
+        self.ingredients = ingredients
+        self.simplified = simplified
+        self.diet_mask = diet_mask
+
+    def get(self, key, default=None):
+        if key == "_id":
+            return ObjectId(self.item_id)
+        slot = self.FIELDS.get(key)
+        value = getattr(self, slot) if slot else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def document(self):
+        return {key: self[key] for key in ("_id", *self.FIELDS) if key in self}
+
+def _intern_all(values):
+    return tuple(sys.intern(str(value)) for value in values or [])
+
+def _deep_size(objects):
+    # Every distinct object counted once: interned strings shared between records are not double counted
+    seen, total = set(), 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, CatalogItem):
+            stack.extend(getattr(obj, slot) for slot in CatalogItem.__slots__)
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+    return total
+
+class _CatalogSnapshot:
+    def __init__(self, version, records, positions):
+        self.version = version
+        self.records = records  # FAISS position -> CatalogItem (None for ids missing from MongoDB)
+        self.positions = positions  # item id -> FAISS position
+        self.loaded_at = time.time()
+        self.size_bytes = _deep_size([records, positions])
+
+class ItemCatalog:
+    def __init__(self, collection=items_collection, version_source=get_catalog_version,
+                 check_interval=VERSION_CHECK_SECONDS):
+        self.collection = collection
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self.ids_source = None
+        self.diet_bits = {}
+        self._diet_exclusions = {}
+        self.checked_at = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._listeners = []
+        self._reloading = threading.Lock()
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return len(snapshot.positions) if snapshot else 0
+
+    def loaded(self):
+        return self._snapshot is not None
+
+    def on_swap(self, listener):
+        # Called with the new snapshot's records after every swap (e.g. to rebuild derived indexes)
+        self._listeners.append(listener)
+
+    def load(self, ids_source, diet_exclusions=None):
+        """
+        Build the first snapshot. ids_source() returns the current FAISS id list; diet_exclusions maps
+        a dietary preference to the ingredient substrings it excludes.
+        """
+        self.ids_source = ids_source
+        self.diet_bits = {diet: 1 << bit for bit, diet in enumerate(diet_exclusions or {})}
+        self._diet_exclusions = {diet: tuple(exclusions) for diet, exclusions in (diet_exclusions or {}).items()}
+        self.reload()
+        return self
+
+    def _diet_mask(self, ingredients):
+        # One bit per diet the item violates, same substring rule as is_item_valid
+        normalized = [ingredient.strip().lower() for ingredient in ingredients]
+        mask = 0
+        for diet, exclusions in self._diet_exclusions.items():
+            if any(exclusion in ingredient for exclusion in exclusions for ingredient in normalized):
+                mask |= self.diet_bits[diet]
+        return mask
+
+    def _record(self, item_id, document):
+        ingredients = _intern_all(document.get("Ingredients"))
+        simplified = _intern_all(document.get("Simplified Ingredients"))
+        return CatalogItem(
+            item_id,
+            document.get("Item_name"),
+            document.get("Price"),
+            sys.intern(document["Store_name"]) if document.get("Store_name") else None,
+            sys.intern(document["Category"]) if document.get("Category") else None,
+            ingredients,
+            simplified if simplified != ingredients else ingredients,
+            self._diet_mask(ingredients),
+        )
+
+    def reload(self):
+        """
+        Build a new snapshot from MongoDB and swap it in.
+        """
+        with self._reloading:
+            version = self.version_source()
+            ids = list(self.ids_source())
+            positions = {item_id: position for position, item_id in enumerate(ids)}
+            records = [None] * len(ids)
+            started = time.perf_counter()
+            for document in self.collection.find({"embedding": {"$exists": True}}, {"embedding": 0}):
+                position = positions.get(str(document["_id"]))
+                if position is not None:
+                    records[position] = self._record(ids[position], document)
+            snapshot = _CatalogSnapshot(version, records, positions)
+            self._snapshot = snapshot
+            self.checked_at = time.monotonic()
+        print(f"Item catalog v{version} loaded: {len(ids)} items, {snapshot.size_bytes / 1e6:.1f} MB "
+              f"in {time.perf_counter() - started:.2f}s.")
+        for listener in self._listeners:
+            try:
+                listener([record for record in records if record is not None])
+            except Exception as e:
+                print(f"Error in item catalog swap listener: {e}")
+        return snapshot
+
+    def refresh_if_stale(self):
+        """
+        Start a background reload when the shared catalog version moved; cheap when it did not.
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is None or now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        try:
+            version = self.version_source()
+        except Exception as e:
+            print(f"Error checking catalog version: {e}")
+            return
+        if version != snapshot.version and not self._reloading.locked():
+            threading.Thread(target=self.reload, name="item-catalog-reload", daemon=True).start()
+
+    def items(self, ids):
+        """
+        {item id: item} for the given ids: catalog records, or MongoDB documents for ids the
+        catalog does not have (not loaded yet, or newer than the last snapshot).
+        """
+        self.refresh_if_stale()
+        snapshot = self._snapshot
+        found, missing = {}, []
+        for item_id in map(str, ids):
+            position = snapshot.positions.get(item_id) if snapshot else None
+            record = snapshot.records[position] if position is not None else None
+            if record is not None:
+                found[item_id] = record
+            else:
+                missing.append(item_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            found.update((str(item["_id"]), item) for item in self.collection.find(
+                {"_id": {"$in": [ObjectId(item_id) for item_id in set(missing)]}}, {"embedding": 0}
+            ))
+        return found
+
+    def diet_allows(self, item, diet):
+        """
+        True/False from the precomputed mask for catalog records and known diets, else None.
+        """
+        bit = self.diet_bits.get(diet)
+        if bit is None or not isinstance(item, CatalogItem):
+            return None
+        return not item.diet_mask & bit
+
+    def footprint(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        count = len(snapshot.positions)
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "items": count,
+            "bytes": snapshot.size_bytes,
+            "bytes_per_item": round(snapshot.size_bytes / count, 1) if count else 0,
+            "loaded_at": snapshot.loaded_at,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+item_catalog = ItemCatalog()
@@ -0,0 +1,127 @@
+import re
+import time
+from collections import Counter, defaultdict
+import numpy as np
+
+# BM25 parameters; item names count more than ingredient lists
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_WEIGHT = 2.0
+INGREDIENT_WEIGHT = 1.0
+
+# Reciprocal-rank fusion constant (the usual 60 from Cormack et al.)
+RRF_K = 60
+
+_word_pattern = re.compile(r"[a-z0-9]+")
+
+# Lowercase words with light plural folding, so "chips" matches "chip" and "berries" "berry"
+def tokenize(text):
+    tokens = []
+    for word in _word_pattern.findall(text.lower()):
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+class _LexicalState:
+    """
+    Immutable snapshot: per-term arrays of document positions and precomputed BM25 weights.
+    """
+
+    def __init__(self, ids, stores, postings):
+        self.ids = ids
+        # Stores as small integer codes so filtering a candidate set is a vectorized compare
+        self.store_codes = {store: code for code, store in enumerate(dict.fromkeys(stores))}
+        self.stores = np.array([self.store_codes[store] for store in stores], dtype=np.int32)
+        self.postings = postings
+
+class ItemLexicalIndex:
+    """
+    In-memory BM25 inverted index over item names and ingredients. Query cost is proportional
+    to the postings of the query terms, not to the catalog size.
+    """
+
+    def __init__(self):
+        self._state = _LexicalState([], [], {})
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._state.ids)
+
+    def build(self, documents):
+        """
+        Rebuild from an iterable of {"_id", "Item_name", "Ingredients", "Store_name"} documents.
+        """
+        ids, stores, term_frequencies, lengths = [], [], [], []
+        for document in documents:
+            frequencies = Counter()
+            for token in tokenize(document.get("Item_name", "")):
+                frequencies[token] += NAME_WEIGHT
+            for ingredient in document.get("Ingredients") or []:
+                for token in tokenize(ingredient):
+                    frequencies[token] += INGREDIENT_WEIGHT
+            ids.append(str(document["_id"]))
+            stores.append(document.get("Store_name"))
+            term_frequencies.append(frequencies)
+            lengths.append(sum(frequencies.values()))
+
+        average_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        raw = defaultdict(lambda: ([], []))
+        for position, frequencies in enumerate(term_frequencies):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[position] / average_length)
+            for term, tf in frequencies.items():
+                positions, weights = raw[term]
+                positions.append(position)
+                weights.append(tf * (BM25_K1 + 1) / (tf + norm))
+
+        count = len(ids)
+        postings = {}
+        for term, (positions, weights) in raw.items():
+            idf = np.log(1 + (count - len(positions) + 0.5) / (len(positions) + 0.5))
+            postings[term] = (np.array(positions, dtype=np.int32), np.array(weights, dtype=np.float32) * idf)
+
+        self._state = _LexicalState(ids, stores, postings)
+        self.built_at = time.time()
+        return self
+
+    def search(self, query, k=10, stores=None):
+        """
+        Top k (item id, BM25 score) for a query, best first; optionally only items of `stores`.
+        """
+        state = self._state
+        hits = [state.postings[term] for term in dict.fromkeys(tokenize(query)) if term in state.postings]
+        if not hits:
+            return []
+        positions = np.concatenate([hit[0] for hit in hits])
+        weights = np.concatenate([hit[1] for hit in hits])
+        if len(positions) * 8 > len(state.ids):
+            # Common terms: a dense accumulator is cheaper than sorting the postings
+            scores = np.bincount(positions, weights=weights, minlength=len(state.ids))
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+        else:
+            candidates, inverse = np.unique(positions, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        if stores:
+            codes = [state.store_codes[store] for store in stores if store in state.store_codes]
+            keep = np.isin(state.stores[candidates], codes)
+            candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(state.ids[candidates[i]], float(scores[i])) for i in order]
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K, limit=10):
+    """
+    Fuse ranked lists of ids: score(id) = sum over lists of 1 / (k + rank). Returns [(id, score)].
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+
+item_lexical_index = ItemLexicalIndex()
@@ -0,0 +1,269 @@
+"""
+Compact, reference-based grocery list documents.
+
+Lists used to embed a copy of every item (name, price, store string) under per-store keys, or
+in a `grocery_list` array for recipe lists. Compact lists (schema 2) store each item as a
+reference plus a price snapshot:
+
+    {"schema": 2, "layout": "stores", "stores": ["Trader Joe's", ...],
+     "items": [{"id": ObjectId, "p": 3.49, "s": 0}, ...], ...}
+
+- `id` is the catalog item id, `p` the price when the list was made, and `s` an index into `stores`.
+- `q` (quantity) is stored only when it is not 1.
+- Items added by hand, which are not in the catalog, keep their name in `n` instead of an `id`.
+- The keys are short on purpose: with real item names, spelled-out keys would cost about as much
+  as the names they replace.
+- Recipe lists use "layout": "items" and keep "ingredient" / "recipe_ids" on each entry.
+
+Totals are not stored. Names come from the in-memory item catalog when a list is read, and
+hydrate_list() returns the exact shape the API has always served. Documents without
+"schema" are legacy documents and are passed through untouched.
+
+Usage:
+    python list_documents.py migrate [--batch-size 500] [--dry-run]
+    python list_documents.py stats
+"""
+import time
+import argparse
+import bson
+from pymongo import ReplaceOne
+from main import items_collection, grocery_lists_collection
+from item_catalog import item_catalog
+
+LIST_SCHEMA_VERSION = 2
+UNAVAILABLE_ITEM = "Unavailable item"
+MIGRATE_BATCH_SIZE = 500
+
+def document_size(document):
+    return len(bson.encode(document))
+
+def is_compact(document):
+    return document.get("schema") == LIST_SCHEMA_VERSION
+
+def store_index(stores, store):
+    if store not in stores:
+        stores.append(store)
+    return stores.index(store)
+
+def _entry(item_id, name, price, store, stores, qty=1):
+    entry = {"id": item_id} if item_id is not None else {"n": name}
+    entry["p"] = round(float(price), 2)
+    entry["s"] = store_index(stores, store)
+    if qty != 1:
+        entry["q"] = qty
+    return entry
+
+def _is_store_list(value):
+    return isinstance(value, dict) and isinstance(value.get("items"), list)
+
+def compact_store_lists(formatted_lists, item_ids):
+    """
+    Compact a per-store list ({store: {"items": [{"Item_name", "Price"}], "Total_Cost"}}).
+    item_ids maps (store, Item_name) to a catalog id; unmatched items are kept by name.
+    Other fields (user_id, messages for stores without items, ...) are kept as they are.
+    """
+    document = {"schema": LIST_SCHEMA_VERSION, "layout": "stores", "stores": [], "items": []}
+    for key, value in formatted_lists.items():
+        if not _is_store_list(value):
+            document[key] = value
+            continue
+        store_index(document["stores"], key)
+        for item in value["items"]:
+            document["items"].append(_entry(
+                item_ids.get((key, item["Item_name"])), item["Item_name"], item["Price"], key, document["stores"],
+                item.get("Quantity", 1),
+            ))
+    return document
+
+def keep_named_entries(document, previous):
+    """
+    Copy the entries of a per-store list that were added or replaced by name (PATCH) into its
+    regenerated `document`, unless the same item is already in that store. Returns how many were kept.
+    """
+    present = {(name, document["stores"][entry["s"]]) for name, entry in zip(entry_names(document), document["items"])}
+    kept = 0
+    for entry in previous.get("items", []):
+        store = previous["stores"][entry["s"]]
+        if "n" not in entry or (entry["n"], store) in present:
+            continue
+        if store in document and not _is_store_list(document[store]):
+            del document[store]  # "No items found" message for the store
+        document["items"].append(dict(entry, s=store_index(document["stores"], store)))
+        present.add((entry["n"], store))
+        kept += 1
+    return kept
+
+def resolved_item_ids(resolved_items):
+    # (store, name) -> id for the items a generation resolved
+    return {(item.get("Store_name"), item["Item_name"]): item["_id"] for item in resolved_items if item}
+
+def compact_recipe_items(grocery_list):
+    """
+    Compact a recipe/meal-plan `grocery_list` array whose entries carry the chosen item's "item_id".
+    Returns (stores, items).
+    """
+    stores, items = [], []
+    for entry in grocery_list:
+        compact = _entry(entry.get("item_id"), entry["item_name"], entry["price"], entry["store"], stores)
+        compact["ingredient"] = entry["ingredient"]
+        if "recipe_ids" in entry:
+            compact["recipe_ids"] = entry["recipe_ids"]
+        items.append(compact)
+    return stores, items
+
+def compact_recipe_list(document, grocery_list):
+    stores, items = compact_recipe_items(grocery_list)
+    return {**document, "schema": LIST_SCHEMA_VERSION, "layout": "items", "stores": stores, "items": items}
+
+def _names(documents):
+    ids = {entry["id"] for document in documents if is_compact(document)
+           for entry in document["items"] if "id" in entry}
+    if not ids:
+        return {}
+    return {item_id: item.get("Item_name") for item_id, item in item_catalog.items(str(item_id) for item_id in ids).items()}
+
+def _entry_name(entry, names):
+    return entry.get("n") or names.get(str(entry.get("id"))) or UNAVAILABLE_ITEM
+
+def _hydrate(document, names):
+    if not is_compact(document):
+        return document
+    hydrated = {key: value for key, value in document.items() if key not in ("schema", "layout", "stores", "items")}
+    stores = document["stores"]
+
+    if document["layout"] == "items":
+        hydrated["grocery_list"] = []
+        for entry in document["items"]:
+            item = {
+                "ingredient": entry.get("ingredient"),
+                "item_name": _entry_name(entry, names),
+                "price": entry["p"],
+                "store": stores[entry["s"]],
+            }
+            if "recipe_ids" in entry:
+                item["recipe_ids"] = entry["recipe_ids"]
+            hydrated["grocery_list"].append(item)
+        return hydrated
+
+    by_store = {store: {"items": [], "Total_Cost": 0} for store in stores}
+    for entry in document["items"]:
+        store_list = by_store[stores[entry["s"]]]
+        item = {"Item_name": _entry_name(entry, names), "Price": entry["p"]}
+        qty = entry.get("q", 1)
+        if qty != 1:
+            item["Quantity"] = qty
+        store_list["items"].append(item)
+        store_list["Total_Cost"] += entry["p"] * qty
+    for store_list in by_store.values():
+        store_list["Total_Cost"] = round(store_list["Total_Cost"], 2)
+    return {**by_store, **hydrated}
+
+def entry_names(document):
+    """
+    Display name of each entry of a compact list, in order.
+    """
+    names = _names([document])
+    return [_entry_name(entry, names) for entry in document["items"]]
+
+def hydrate_lists(documents):
+    """
+    API shape for a page of list documents, with one catalog lookup for all of them.
+    """
+    documents = list(documents)
+    names = _names(documents)
+    return [_hydrate(document, names) for document in documents]
+
+def hydrate_list(document):
+    return hydrate_lists([document])[0] if document else document
+
+def _migrated(document):
+    """
+    The compact form of a legacy document, or None if it is not a grocery list.
+    """
+    if "grocery_list" in document and isinstance(document["grocery_list"], list):
+        pairs = {(entry.get("store"), entry.get("item_name")) for entry in document["grocery_list"]}
+        ids = _lookup_ids(pairs)
+        grocery_list = [dict(entry, item_id=ids.get((entry.get("store"), entry.get("item_name"))))
+                        for entry in document["grocery_list"]]
+        rest = {key: value for key, value in document.items() if key != "grocery_list"}
+        return compact_recipe_list(rest, grocery_list)
+
+    if not any(_is_store_list(value) for value in document.values()):
+        return None
+    pairs = {(key, item.get("Item_name")) for key, value in document.items() if _is_store_list(value)
+             for item in value["items"]}
+    return compact_store_lists(document, _lookup_ids(pairs))
+
+def _lookup_ids(pairs):
+    # One query per store, served by the (Store_name, Item_name) index
+    by_store = {}
+    for store, name in pairs:
+        by_store.setdefault(store, []).append(name)
+    ids = {}
+    for store, names in by_store.items():
+        for item in items_collection.find({"Store_name": store, "Item_name": {"$in": names}}, {"Item_name": 1}):
+            ids.setdefault((store, item["Item_name"]), item["_id"])
+    return ids
+
+def migrate_lists(collection=grocery_lists_collection, batch_size=MIGRATE_BATCH_SIZE, dry_run=False, progress=print):
+    """
+    Rewrite legacy list documents in the compact schema. Safe to rerun: compact documents are
+    skipped, and each replace only applies if the document is still in the legacy schema.
+    """
+    started = time.perf_counter()
+    summary = {"scanned": 0, "migrated": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+    operations = []
+
+    def flush():
+        if operations and not dry_run:
+            collection.bulk_write(operations, ordered=False)
+        operations.clear()
+
+    for document in collection.find({"schema": {"$exists": False}}):
+        summary["scanned"] += 1
+        compact = _migrated(document)
+        if compact is None:
+            summary["skipped"] += 1
+            continue
+        summary["migrated"] += 1
+        summary["bytes_before"] += document_size(document)
+        summary["bytes_after"] += document_size(compact)
+        operations.append(ReplaceOne({"_id": document["_id"], "schema": {"$exists": False}}, compact))
+        if len(operations) >= batch_size:
+            flush()
+            progress(f"Migrated {summary['migrated']} lists ({summary['scanned']} scanned)")
+    flush()
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    if summary["bytes_before"]:
+        summary["size_reduction"] = round(1 - summary["bytes_after"] / summary["bytes_before"], 3)
+    progress(f"{'Would migrate' if dry_run else 'Migrated'} {summary['migrated']} of {summary['scanned']} legacy lists: "
+             f"{summary['bytes_before']} -> {summary['bytes_after']} bytes")
+    return summary
+
+def list_stats(collection=grocery_lists_collection):
+    # Sizes of the stored documents, resolution trace included; trace_bytes is the trace's share
+    stats = {"compact": {"count": 0, "bytes": 0, "trace_bytes": 0}, "legacy": {"count": 0, "bytes": 0, "trace_bytes": 0}}
+    for document in collection.find():
+        bucket = stats["compact" if is_compact(document) else "legacy"]
+        bucket["count"] += 1
+        bucket["bytes"] += document_size(document)
+        if "resolution_trace" in document:
+            bucket["trace_bytes"] += document_size({"resolution_trace": document["resolution_trace"]})
+    for bucket in stats.values():
+        bucket["average_bytes"] = round(bucket["bytes"] / bucket["count"], 1) if bucket["count"] else 0
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate", "stats"])
+    parser.add_argument("--batch-size", type=int, default=MIGRATE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report the size change without writing")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        print(migrate_lists(batch_size=args.batch_size, dry_run=args.dry_run))
+    else:
+        print(list_stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from list_documents import is_compact, entry_names, store_index, hydrate_list
+
+# A legacy grocery list stores one sub-document per store, {"items": [{"Item_name", "Price"}], "Total_Cost"},
+# next to user_id/list_name/created_at. Store keys are whatever the generator produced, so the
+# update below discovers them with $objectToArray instead of naming them. Compact lists
+# (list_documents.py) are edited in memory and written back with a compare-and-set.
+
+EDIT_OPS = ("add", "remove", "replace")
+
+# Compare-and-set attempts for compact lists before giving up on a list that keeps changing
+COMPACT_EDIT_ATTEMPTS = 3
+
+class ListEditError(Exception):
+    pass
+
+class InvalidEdit(ListEditError, ValueError):
+    pass
+
+class ListNotFound(ListEditError):
+    pass
+
+class ListForbidden(ListEditError):
+    pass
+
+class ItemNotFound(ListEditError):
+    pass
+
+class ListEditConflict(ListEditError):
+    pass
+
+def _literal(value):
+    # Item names and store keys are user data; never let a leading "$" be read as a field path
+    return {"$literal": value}
+
+def _is_store(field):
+    return {"$isArray": f"{field}.v.items"}
+
+def _fields():
+    return {"$objectToArray": "$$ROOT"}
+
+def _item_names(store=None):
+    """
+    Expression for every Item_name in the list (or in one store) before the edit.
+    """
+    stores = {"$filter": {"input": _fields(), "as": "field", "cond": _is_store("$$field")}}
+    if store is not None:
+        stores = {"$filter": {"input": stores, "as": "field", "cond": {"$eq": ["$$field.k", _literal(store)]}}}
+    return {"$reduce": {"input": stores, "initialValue": [],
+                        "in": {"$concatArrays": ["$$value", "$$this.v.items.Item_name"]}}}
+
+def _in_store(store, changed):
+    # Apply `changed` to the current store only if the operation targets it (or every store)
+    if store is None:
+        return changed
+    return {"$cond": [{"$eq": ["$$field.k", _literal(store)]}, changed, "$$items"]}
+
+def _apply(items, operation):
+    """
+    Wrap the items expression with one operation; $let keeps the expression linear in the batch size.
+    """
+    op, store = operation["op"], operation.get("store")
+    if op == "add":
+        changed = {"$concatArrays": ["$$items", [_literal(operation["item"])]]}
+    elif op == "remove":
+        changed = {"$filter": {"input": "$$items", "as": "item",
+                               "cond": {"$ne": ["$$item.Item_name", _literal(operation["item_name"])]}}}
+    else:
+        changed = {"$map": {"input": "$$items", "as": "item", "in": {"$cond": [
+            {"$eq": ["$$item.Item_name", _literal(operation["item_name"])]}, _literal(operation["item"]), "$$item"
+        ]}}}
+    return {"$let": {"vars": {"items": items}, "in": _in_store(store, changed)}}
+
+def validate_operations(operations):
+    """
+    Check a batch of edits and normalise items to the stored {"Item_name", "Price"} shape.
+    """
+    if not operations:
+        raise InvalidEdit("At least one operation is required.")
+    normalised = []
+    for position, operation in enumerate(operations):
+        op = operation.get("op")
+        if op not in EDIT_OPS:
+            raise InvalidEdit(f"Operation {position}: op must be one of {', '.join(EDIT_OPS)}.")
+        if op in ("remove", "replace") and not operation.get("item_name"):
+            raise InvalidEdit(f"Operation {position}: {op} needs item_name.")
+        if op in ("add", "replace") and not operation.get("item"):
+            raise InvalidEdit(f"Operation {position}: {op} needs item.")
+        if op == "add" and not operation.get("store"):
+            raise InvalidEdit(f"Operation {position}: add needs store.")
+        edit = {"op": op, "store": operation.get("store"), "item_name": operation.get("item_name")}
+        if operation.get("item"):
+            edit["item"] = {"Item_name": operation["item"]["Item_name"], "Price": float(operation["item"]["Price"])}
+        normalised.append(edit)
+    return normalised
+
+def list_edit_pipeline(operations):
+    """
+    Aggregation-pipeline update applying every operation in order, then recomputing each store's
+    Total_Cost from its items.
+    """
+    items = "$$field.v.items"
+    for operation in operations:
+        items = _apply(items, operation)
+
+    # Stores that only appear in "add" operations are created empty first
+    new_stores = []
+    for store in dict.fromkeys(operation["store"] for operation in operations if operation["op"] == "add"):
+        new_stores.append({"$cond": [
+            {"$in": [_literal(store), {"$map": {"input": _fields(), "in": "$$this.k"}}]},
+            [],
+            [{"k": _literal(store), "v": {"items": [], "Total_Cost": 0}}],
+        ]})
+
+    store_entry = {"$let": {"vars": {"items": items}, "in": {"k": "$$field.k", "v": {"$mergeObjects": [
+        "$$field.v", {"items": "$$items", "Total_Cost": {"$round": [{"$sum": "$$items.Price"}, 2]}}
+    ]}}}}
+    return [{"$replaceWith": {"$arrayToObject": {"$map": {
+        "input": {"$concatArrays": [_fields(), *new_stores]},
+        "as": "field",
+        "in": {"$cond": [_is_store("$$field"), store_entry, "$$field"]},
+    }}}}]
+
+def _missing_items(grocery_list, operations, names_by_store):
+    missing = []
+    for operation in operations:
+        if operation["op"] == "add":
+            continue
+        stores = [operation["store"]] if operation["store"] else list(names_by_store)
+        if not any(operation["item_name"] in names_by_store.get(store, ()) for store in stores):
+            missing.append(operation["item_name"])
+    return missing
+
+def _edit_compact(collection, grocery_list, user_id, operations):
+    """
+    Apply the operations to a compact list in memory and write the items back only if nobody
+    changed them meanwhile. Returns the updated document, or None on a conflicting write.
+    """
+    # Recipe and meal plan lists tie every entry to an ingredient, which an added item doesn't have
+    if grocery_list.get("layout") == "items" and any(operation["op"] == "add" for operation in operations):
+        raise InvalidEdit("Items cannot be added to a recipe or meal plan list; replace or remove them instead.")
+    stores = list(grocery_list["stores"])
+    entries = list(zip(entry_names(grocery_list), grocery_list["items"]))
+    names_by_store = {}
+    for name, entry in entries:
+        names_by_store.setdefault(stores[entry["s"]], set()).add(name)
+    missing = _missing_items(grocery_list, operations, names_by_store)
+    if missing:
+        raise ItemNotFound(f"Item(s) not found in the grocery list: {', '.join(missing)}")
+
+    for operation in operations:
+        store = operation["store"]
+        if operation["op"] == "add":
+            item = operation["item"]
+            entries.append((item["Item_name"], {
+                "n": item["Item_name"], "p": round(item["Price"], 2), "s": store_index(stores, store)
+            }))
+            continue
+
+        def matches(name, entry):
+            return name == operation["item_name"] and (store is None or stores[entry["s"]] == store)
+
+        if operation["op"] == "remove":
+            entries = [(name, entry) for name, entry in entries if not matches(name, entry)]
+        else:
+            item = operation["item"]
+            # Keep the store and, on recipe lists, the ingredient / recipe_ids the entry belongs to
+            entries = [
+                (item["Item_name"], {**{key: value for key, value in entry.items() if key not in ("id", "n", "p", "q")},
+                                     "n": item["Item_name"], "p": round(item["Price"], 2)})
+                if matches(name, entry) else (name, entry)
+                for name, entry in entries
+            ]
+
+    return collection.find_one_and_update(
+        {"_id": grocery_list["_id"], "user_id": user_id, "items": grocery_list["items"]},
+        {"$set": {"stores": stores, "items": [entry for _, entry in entries]}},
+        projection={"resolution_trace": 0}, return_document=ReturnDocument.AFTER,
+    )
+
+def apply_list_edits(collection, list_id, user_id, operations):
+    """
+    Apply a batch of add/remove/replace operations to one grocery list atomically and return
+    the updated list (in the API shape). Items named by remove/replace must be in the list
+    before the edit, otherwise nothing is changed.
+    """
+    operations = validate_operations(operations)
+    for _ in range(COMPACT_EDIT_ATTEMPTS):
+        grocery_list = collection.find_one({"_id": ObjectId(list_id)})
+        if grocery_list is None:
+            raise ListNotFound("Grocery list not found")
+        if str(grocery_list.get("user_id")) != str(user_id):
+            raise ListForbidden("You don't have permission to modify this list")
+
+        if is_compact(grocery_list):
+            updated = _edit_compact(collection, grocery_list, user_id, operations)
+            if updated is not None:
+                return hydrate_list(updated)
+            continue
+
+        query = {"_id": ObjectId(list_id), "user_id": user_id}
+        required = [{"$in": [_literal(operation["item_name"]), _item_names(operation["store"])]}
+                    for operation in operations if operation["op"] in ("remove", "replace")]
+        if required:
+            query["$expr"] = {"$and": required}
+        updated = collection.find_one_and_update(
+            query, list_edit_pipeline(operations), projection={"resolution_trace": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is not None:
+            return updated
+
+        names_by_store = {store: {item.get("Item_name") for item in value["items"]}
+                          for store, value in grocery_list.items()
+                          if isinstance(value, dict) and isinstance(value.get("items"), list)}
+        missing = _missing_items(grocery_list, operations, names_by_store)
+        if missing:
+            raise ItemNotFound(f"Item(s) not found in the grocery list: {', '.join(missing)}")
+    raise ListEditConflict("The grocery list is being changed concurrently; try again.")
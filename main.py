@@ -9,6 +9,7 @@ import numpy as np
 from dotenv import load_dotenv
 from scipy.spatial.distance import cosine
 from sentence_transformers import SentenceTransformer  # Using sentence transformers for embeddings
+from metrics import timed
 
 # Load environment variables and connect to MongoDB
 load_dotenv(override=True)
@@ -24,7 +25,8 @@ recipes_collection = db["recipes"]
 grocery_lists_collection = db["grocery_lists"]
 
 # Initialize the sentence-transformers model
-model = SentenceTransformer('all-MPNet-base-v2')
+MODEL_NAME = 'all-MPNet-base-v2'
+model = SentenceTransformer(MODEL_NAME)
 
 # Ping to check the connection
 try:
@@ -67,7 +69,8 @@ def build_faiss_index():
 # Function to generate embeddings for an item name (or description)
 def generate_embedding(text):
     try:
-        return model.encode(text).tolist()
+        with timed("embedding"):
+            return model.encode(text).tolist()
     except Exception as e:
         print(f"Error generating embedding for '{text}': {e}")
         return None
@@ -78,13 +81,15 @@ def search_items_by_query_faiss(query, index, ids, top_k=25):
 
     if query_embedding:
         query_np = np.array([query_embedding]).astype("float32")
-        distances, indices = index.search(query_np, top_k)
+        with timed("faiss_search"):
+            distances, indices = index.search(query_np, top_k)
         
         similar_items = []
         for dist, idx in zip(distances[0], indices[0]):
             if idx != -1:  # Check if a valid index is returned
                 item_id = ids[idx]
-                item = items_collection.find_one({"_id": ObjectId(item_id)})
+                with timed("item_fetch"):
+                    item = items_collection.find_one({"_id": ObjectId(item_id)})
                 if item:
                     similar_items.append((item["Item_name"], 1 - dist))  # Convert distance to similarity
         
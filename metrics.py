@@ -0,0 +1,117 @@
+import time
+import bisect
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets (seconds) covering everything from a FAISS lookup to a slow GPT-4 call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with one series per label value.
+    """
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            position = bisect.bisect_left(self.buckets, seconds)
+            if position < len(self.buckets):
+                series["counts"][position] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {series["count"]}')
+        return "\n".join(lines)
+
+stage_seconds = Histogram(
+    "chopnshop_stage_duration_seconds", "Time spent in each stage of the grocery pipeline.", "stage"
+)
+request_seconds = Histogram(
+    "chopnshop_request_duration_seconds", "End-to-end request latency per route.", "route"
+)
+
+# Per-request accumulated stage timings; the dict is shared with threadpool workers via context copying
+_request_stages = ContextVar("request_stages", default=None)
+
+def record_stage(stage, seconds):
+    stage_seconds.observe(stage, seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block as one stage: with timed("faiss_search"): ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def timed_stage(stage):
+    """
+    Decorator form of timed().
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing_header(stages, total):
+    # Server-Timing is understood by browser dev tools, e.g. "embedding;dur=12.5, openai;dur=4100.2"
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+async def timing_middleware(request, call_next):
+    """
+    Collect stage timings for one request, record its latency and return the breakdown
+    in a Server-Timing header.
+    """
+    stages = {}
+    token = _request_stages.set(stages)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_stages.reset(token)
+    total = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    request_seconds.observe(getattr(route, "path", "unmatched"), total)
+    response.headers["Server-Timing"] = server_timing_header(stages, total)
+    return response
+
+def render_metrics(extra_lines=()):
+    """
+    Prometheus text exposition of every histogram plus any extra pre-rendered lines.
+    """
+    sections = [stage_seconds.render(), request_seconds.render(), *extra_lines]
+    return "\n".join(sections) + "\n"
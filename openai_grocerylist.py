@@ -3,9 +3,17 @@ import os
 from dotenv import load_dotenv
 from pymongo import MongoClient
 import faiss
+import threading
 import numpy as np
+from collections import OrderedDict
 from bson.objectid import ObjectId
-from main import generate_embedding, load_faiss_index
+from main import generate_embedding
+from metrics import timed
+from store_shards import item_shards
+from lexical_index import item_lexical_index, reciprocal_rank_fusion
+from item_catalog import item_catalog
+from index_artifacts import item_index
+from list_documents import compact_store_lists, resolved_item_ids, hydrate_list
 
 # Load environment variables
 load_dotenv(override=True)
@@ -18,10 +26,16 @@ db = client["chop-n-shop"]
 items_collection = db["items"]
 grocery_lists_collection = db["grocery_lists"]
 
-# Load FAISS index and item IDs
-faiss_index, item_ids = load_faiss_index("faiss_index_file.index", "ids_list.pkl")
-if not faiss_index or not item_ids:
-    raise ValueError("FAISS index or item IDs not loaded successfully. Ensure the files exist.")
+# Load the published FAISS index and item IDs (hot swapped when a new version is published)
+item_index.load()
+
+# BM25 index over the same items, fused with the vector hits (set HYBRID_SEARCH=0 for vector only)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+
+# Best-match picks from OpenAI, keyed by query and candidate ids so single and batch generation share them
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+rerank_cache = OrderedDict()
+_rerank_lock = threading.Lock()
 
 # Normalize ingredients for consistent processing
 def normalize_ingredients(ingredients):
@@ -34,56 +48,145 @@ def check_allergen_suitability(ingredients, allergens):
 
     return all(allergen not in ingredient for ingredient in ingredients for allergen in allergens)
 
+# Ingredient substrings excluded by each dietary preference
+DIETARY_EXCLUSIONS = {
+    "vegan": [
+        "meat", "lamb", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
+        "salami", "sausage", "bacon", "hot dog", "deli meat", "fish", "salmon", "tuna", "shrimp", "lobster", 
+        "crab", "cod", "mackerel", "sardines", "anchovies", "shellfish", "eggs", "chicken eggs", "duck eggs", 
+        "quail eggs", "egg powder", "milk", "cow's milk", "goat's milk", "sheep's milk", "cream", "butter", 
+        "cheese", "cheddar", "mozzarella", "parmesan", "brie", "gouda", "feta", "yogurt", "ice cream", "whey", 
+        "casein", "lactose", "honey", "royal jelly", "bee pollen", "gelatin", "marshmallow", "gummy", "fish sauce", 
+        "anchovy paste", "animal fat", "lard", "tallow", "bone marrow", "rennet"
+    ],
+    "vegetarian": [
+        "meat", "lamb", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
+        "salami", "sausage", "bacon", "hot dog", "deli meat", "fish", "salmon", "tuna", "shrimp", "lobster", 
+        "crab", "cod", "mackerel", "sardines", "anchovies", "shellfish"
+    ],
+    "gluten-free": [
+        "wheat", "barley", "rye", "oats", "seitan", "bulgur", "couscous", "wheat flour", "whole wheat", "wheat germ", 
+        "wheat bran", "semolina", "durum", "wheat starch", "spelt", "farro", "malt", "malt syrup", "malt vinegar", 
+        "rye flour", "rye bread", "rye crackers", "barley flour", "barley-based products", "seitan", "bread", "cake", 
+        "cookie", "pasta"
+    ],
+    "lactose-free": [
+        "milk", "cow's milk", "goat's milk", "sheep's milk", "cheese", "cheddar", "mozzarella", "brie", "gouda", 
+        "feta", "parmesan", "cream cheese", "ricotta", "butter", "margarine", "cream", "heavy cream", "sour cream", 
+        "half-and-half", "whipped cream", "ice cream", "yogurt", "Greek yogurt", "whey", "lactose"
+    ],
+    "pescetarian": [
+        "meat", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
+        "lamb", "chicken breast", "chicken wings", "chicken legs", "chicken thighs", "steak", "ground beef", 
+        "pork chops", "bacon", "ham", "sausage", "pork", "duck breast", "duck legs", "confit"
+    ]
+}
+
 # Validate dietary preferences and allergens
 def is_item_valid(item, dietary_preferences, allergens):
     ingredients = normalize_ingredients(item.get("Ingredients", []))
 
-    # Dietary exclusions based on preferences
-    exclusions = {
-        "vegan": [
-            "meat", "lamb", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
-            "salami", "sausage", "bacon", "hot dog", "deli meat", "fish", "salmon", "tuna", "shrimp", "lobster", 
-            "crab", "cod", "mackerel", "sardines", "anchovies", "shellfish", "eggs", "chicken eggs", "duck eggs", 
-            "quail eggs", "egg powder", "milk", "cow's milk", "goat's milk", "sheep's milk", "cream", "butter", 
-            "cheese", "cheddar", "mozzarella", "parmesan", "brie", "gouda", "feta", "yogurt", "ice cream", "whey", 
-            "casein", "lactose", "honey", "royal jelly", "bee pollen", "gelatin", "marshmallow", "gummy", "fish sauce", 
-            "anchovy paste", "animal fat", "lard", "tallow", "bone marrow", "rennet"
-        ],
-        "vegetarian": [
-            "meat", "lamb", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
-            "salami", "sausage", "bacon", "hot dog", "deli meat", "fish", "salmon", "tuna", "shrimp", "lobster", 
-            "crab", "cod", "mackerel", "sardines", "anchovies", "shellfish"
-        ],
-        "gluten-free": [
-            "wheat", "barley", "rye", "oats", "seitan", "bulgur", "couscous", "wheat flour", "whole wheat", "wheat germ", 
-            "wheat bran", "semolina", "durum", "wheat starch", "spelt", "farro", "malt", "malt syrup", "malt vinegar", 
-            "rye flour", "rye bread", "rye crackers", "barley flour", "barley-based products", "seitan", "bread", "cake", 
-            "cookie", "pasta"
-        ],
-        "lactose-free": [
-            "milk", "cow's milk", "goat's milk", "sheep's milk", "cheese", "cheddar", "mozzarella", "brie", "gouda", 
-            "feta", "parmesan", "cream cheese", "ricotta", "butter", "margarine", "cream", "heavy cream", "sour cream", 
-            "half-and-half", "whipped cream", "ice cream", "yogurt", "Greek yogurt", "whey", "lactose"
-        ],
-        "pescetarian": [
-            "meat", "chicken", "beef", "pork", "turkey", "duck", "veal", "bison", "goat", "game meat", 
-            "lamb", "chicken breast", "chicken wings", "chicken legs", "chicken thighs", "steak", "ground beef", 
-            "pork chops", "bacon", "ham", "sausage", "pork", "duck breast", "duck legs", "confit"
-        ]
-    }
-    if dietary_preferences in exclusions:
-        if any(exclusion in ingredient for exclusion in exclusions[dietary_preferences] for ingredient in ingredients):
+    # Catalog records carry a precomputed mask of the diets they violate
+    allowed = item_catalog.diet_allows(item, dietary_preferences)
+    if allowed is False:
+        return False
+    if allowed is None and dietary_preferences in DIETARY_EXCLUSIONS:
+        if any(exclusion in ingredient for exclusion in DIETARY_EXCLUSIONS[dietary_preferences] for ingredient in ingredients):
             return False
 
     # Allergen check
     return check_allergen_suitability(ingredients, allergens)
 
-# Search for items in the FAISS index by query and refine with OpenAI
-def search_items_by_query_faiss(query):
-    query_embedding = generate_embedding(query)
-    _, indices = faiss_index.search(np.array([query_embedding], dtype=np.float32), k=10)
-    results = [items_collection.find_one({"_id": ObjectId(item_ids[idx])}) for idx in indices[0] if idx < len(item_ids)]
-    return refine_with_openai(query, results)
+# In-memory item records for search hits, rebuilt (with the lexical index) when the catalog version changes
+if HYBRID_SEARCH:
+    item_catalog.on_swap(lambda records: item_lexical_index.build(records))
+item_catalog.load(lambda: item_index.current().ids, DIETARY_EXCLUSIONS)
+item_index.on_swap(lambda snapshot: item_catalog.reload())
+# The ingest writes shards before publishing, so a swap also means new shards: check them right away
+item_index.on_swap(lambda snapshot: item_shards.refresh())
+
+# Nearest item ids for a query embedding, from the per-store shards when every searched store has one
+def vector_search_ids(query_embedding, k=10, stores=None):
+    if item_shards.covers(stores):
+        with timed("faiss_search"):
+            return [item_id for _, item_id, _ in item_shards.search(query_embedding, k=k, stores=stores)]
+    snapshot = item_index.current()
+    with timed("faiss_search"):
+        _, indices = snapshot.index.search(np.array([query_embedding], dtype=np.float32), k=k)
+    return [snapshot.ids[idx] for idx in indices[0] if 0 <= idx < len(snapshot.ids)]
+
+def hybrid_search_ids(query, k=10, stores=None):
+    """
+    Vector and BM25 hits fused with reciprocal-rank fusion. Returns (item ids, confident), where
+    confident means both retrievers ranked the same item first.
+    """
+    vector_ids = vector_search_ids(generate_embedding(query), k=k, stores=stores)
+    if not HYBRID_SEARCH:
+        return vector_ids, False
+    with timed("lexical_search"):
+        lexical_ids = [item_id for item_id, _ in item_lexical_index.search(query, k=k, stores=stores)]
+    fused = [item_id for item_id, _ in reciprocal_rank_fusion(vector_ids, lexical_ids, limit=k)]
+    confident = bool(vector_ids and lexical_ids) and vector_ids[0] == lexical_ids[0]
+    return fused, confident
+
+# Search for items by query (vector + lexical) and refine with OpenAI
+def search_items_by_query_faiss(query, stores=None):
+    hit_ids, confident = hybrid_search_ids(query, k=10, stores=stores)
+    return pick_best_item(query, hit_ids, confident)
+
+def pick_best_item(query, hit_ids, confident):
+    with timed("item_fetch"):
+        items = item_catalog.items(hit_ids)
+    results = [items.get(item_id) for item_id in hit_ids]
+    # Both retrievers agree on the best item: no need to ask GPT-4 to pick it
+    if confident and results[0]:
+        return results[0]
+    return rerank(query, results)
+
+# Resolve each unique request once, recording what was searched and chosen
+def resolve_grocery_items(requests, stores=None):
+    """
+    Returns ({request: best item or None}, trace), where each trace entry keeps the query and the
+    chosen id so the list can be rebuilt later without searching again.
+    """
+    resolved, trace = {}, []
+    for request in dict.fromkeys(requests):
+        hit_ids, confident = hybrid_search_ids(request, k=10, stores=stores)
+        item = pick_best_item(request, hit_ids, confident)
+        resolved[request] = item
+        trace.append({"query": request, "chosen_id": item["_id"] if item else None})
+    return resolved, trace
+
+PREFERENCE_FIELDS = ("Budget", "Grocery_items", "Dietary_preferences", "Allergies", "Store_preference")
+
+# Stored with the list under "resolution_trace"; "requests" is a list because queries may contain "."
+def resolution_trace_document(user_preferences, stores, trace):
+    return {
+        "preferences": {field: user_preferences.get(field) for field in PREFERENCE_FIELDS},
+        "stores": stores,
+        "requests": trace,
+    }
+
+def rerank(query, candidates):
+    """
+    refine_with_openai behind an LRU cache: the same query over the same candidates asks OpenAI once.
+    """
+    candidates = [item for item in candidates if item]
+    key = (query, tuple(str(item["_id"]) for item in candidates))
+    with _rerank_lock:
+        if key in rerank_cache:
+            rerank_cache.move_to_end(key)
+            best_id = rerank_cache[key]
+            return next((item for item in candidates if str(item["_id"]) == best_id), None)
+
+    best_match_item = refine_with_openai(query, candidates)
+    # Failed calls return None and are not cached, so they are retried next time
+    if best_match_item is not None:
+        with _rerank_lock:
+            rerank_cache[key] = str(best_match_item["_id"])
+            if len(rerank_cache) > RERANK_CACHE_SIZE:
+                rerank_cache.popitem(last=False)
+    return best_match_item
 
 def refine_with_openai(query, faiss_results):
     """
@@ -99,12 +202,13 @@ def refine_with_openai(query, faiss_results):
             messages.append({"role": "user", "content": f"Item: {item['Item_name']}, Price: {item['Price']}"})
         messages.append({"role": "user", "content": "Select the best matching item by returning only its Item_name."})
 
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=150,
-            temperature=0.7
-        )
+        with timed("openai"):
+            response = openai.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7
+            )
 
         # Extract the best match from OpenAI's response
         best_match_name = response.choices[0].message.content.strip()
@@ -117,18 +221,23 @@ def refine_with_openai(query, faiss_results):
         print(f"Error refining results with OpenAI: {e}")
         return None
     
-# Generate grocery list based on user preferences
-def generate_grocery_list(user_preferences):
+# Split resolved items into per-store lists within the budget
+def build_grocery_list(user_preferences, resolved_items):
+    """
+    Build the per-store grocery list from already resolved items ({request: best item or None}).
+    """
     grocery_lists = {"Trader Joe's": [], "Whole Foods Market": []}
     total_costs = {"Trader Joe's": 0, "Whole Foods Market": 0}
     selected_categories = {"Trader Joe's": set(), "Whole Foods Market": set()}
 
     for store in grocery_lists.keys():
         for request in user_preferences["Grocery_items"]:
-            refined_item = search_items_by_query_faiss(request)
+            refined_item = resolved_items.get(request)
 
             if refined_item and refined_item.get("Store_name") == store:
-                if not is_item_valid(refined_item, user_preferences["Dietary_preferences"], user_preferences["Allergies"]):
+                with timed("filter"):
+                    valid = is_item_valid(refined_item, user_preferences["Dietary_preferences"], user_preferences["Allergies"])
+                if not valid:
                     continue
 
                 item_price = float(refined_item.get("Price", 0))
@@ -155,11 +264,61 @@ def generate_grocery_list(user_preferences):
     if user_preferences.get("Store_preference"):
         store = user_preferences["Store_preference"]
         return {store: formatted_lists.get(store, {"message": f"No items found for {store}."})}
-    
-    grocery_lists_collection.insert_one(formatted_lists)  # Insert here
-
     return formatted_lists
 
+# Compact list document for one generation; the caller adds the owner and writes it once
+def generate_grocery_list_document(user_preferences):
+    # Each requested item is searched and reranked once, not once per store
+    stores = [user_preferences["Store_preference"]] if user_preferences.get("Store_preference") else None
+    resolved_items, trace = resolve_grocery_items(user_preferences["Grocery_items"], stores=stores)
+    formatted_lists = build_grocery_list(user_preferences, resolved_items)
+    document = compact_store_lists(formatted_lists, resolved_item_ids(resolved_items.values()))
+    document["resolution_trace"] = resolution_trace_document(user_preferences, stores, trace)
+    return document
+
+# Generate grocery list based on user preferences (per-store shape, not saved)
+def generate_grocery_list(user_preferences):
+    document = generate_grocery_list_document(user_preferences)
+    document.pop("resolution_trace")
+    return hydrate_list(document)
+
+# Rebuild a saved list after a preference change, reusing its resolution trace
+def regenerate_grocery_list(resolution_trace, changes):
+    """
+    Re-run only the filter and budget stages over the items chosen last time. Only requests that
+    are new, whose chosen item left the catalog, or that matched nothing are searched again; a
+    different store preference searches everything again. Returns (compact list document, stats).
+    """
+    user_preferences = dict(resolution_trace["preferences"], **changes)
+    stores = [user_preferences["Store_preference"]] if user_preferences.get("Store_preference") else None
+    traced = {entry["query"]: entry for entry in resolution_trace["requests"]} if resolution_trace.get("stores") == stores else {}
+    requests = list(dict.fromkeys(user_preferences["Grocery_items"]))
+
+    with timed("item_fetch"):
+        chosen = item_catalog.items(
+            str(traced[request]["chosen_id"]) for request in requests
+            if request in traced and traced[request]["chosen_id"] is not None
+        )
+    resolved, trace, to_search = {}, {}, []
+    for request in requests:
+        entry = traced.get(request)
+        item = chosen.get(str(entry["chosen_id"])) if entry and entry["chosen_id"] is not None else None
+        if item is None:
+            to_search.append(request)
+        else:
+            resolved[request], trace[request] = item, entry
+
+    searched, searched_trace = resolve_grocery_items(to_search, stores=stores)
+    resolved.update(searched)
+    trace.update((entry["query"], entry) for entry in searched_trace)
+
+    formatted_lists = build_grocery_list(user_preferences, resolved)
+    document = compact_store_lists(formatted_lists, resolved_item_ids(resolved.values()))
+    document["resolution_trace"] = resolution_trace_document(
+        user_preferences, stores, [trace[request] for request in requests]
+    )
+    return document, {"reused": len(requests) - len(to_search), "searched": len(to_search)}
+
 # Example user preferences
 user_preferences = {
     "Budget": 50.00,
@@ -6,6 +6,7 @@ from pymongo import MongoClient
 import pymongo
 import requests
 import re 
+from metrics import timed
 
 load_dotenv(override=True)
 
@@ -23,17 +24,18 @@ def generate_recipe(prompt):
     Generate a recipe using OpenAI based on the user's prompt.
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a professional recipe generator."},
-                {"role": "user", "content": f"Create a detailed recipe based on the following request: {prompt}. "
-                                             f"Return the recipe in JSON format with the following keys: "
-                                             f"name, ingredients (list), simplified ingredients (list), instructions (list), prep_time, cook_time, total_time."}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
+        with timed("openai"):
+            response = openai.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "You are a professional recipe generator."},
+                    {"role": "user", "content": f"Create a detailed recipe based on the following request: {prompt}. "
+                                                 f"Return the recipe in JSON format with the following keys: "
+                                                 f"name, ingredients (list), simplified ingredients (list), instructions (list), prep_time, cook_time, total_time."}
+                ],
+                max_tokens=1000,
+                temperature=0.7
+            )
         recipe_json = response.choices[0].message.content.strip()
         recipe_data = json.loads(recipe_json)  # Convert JSON string to Python dictionary
         return recipe_data
@@ -63,7 +65,18 @@ def generate_dish_image(prompt):
         return None
 
 
-def save_recipe_to_db(recipe_data, image_url):
+def store_ingredient_matches(recipe_id, recipe_document):
+    """
+    Precompute ingredient -> item candidates for a new recipe; a failure only costs a live search later.
+    """
+    try:
+        # Imported here: it loads the item index and catalog, which recipe generation alone does not need
+        from openai_recipe_grocery_list import precompute_recipe_matches
+        precompute_recipe_matches(recipe_id, recipe_document)
+    except Exception as e:
+        print(f"Error precomputing ingredient matches for recipe {recipe_id}: {e}")
+
+def save_recipe_to_db(recipe_data, image_url=None):
     """
     Save the recipe to the MongoDB `recipes` collection, including simplified ingredients.
     """
@@ -79,8 +92,10 @@ def save_recipe_to_db(recipe_data, image_url):
             "link": recipe_data.get('link', 'Unknown'),
             "image_url": image_url
         }
-        result = recipes_collection.insert_one(recipe_document)
+        with timed("db_write"):
+            result = recipes_collection.insert_one(recipe_document)
         # print(f"Recipe saved successfully with ID: {result.inserted_id}")
+        store_ingredient_matches(result.inserted_id, recipe_document)
         return result.inserted_id
     except Exception as e:
         # print(f"Error saving recipe to database: {e}")
@@ -5,7 +5,11 @@ from pymongo import MongoClient
 import faiss
 import numpy as np
 from bson.objectid import ObjectId
-from main import generate_embedding, load_faiss_index
+from pymongo import UpdateOne
+from main import model, generate_embedding
+from metrics import timed
+from item_catalog import item_catalog
+from index_artifacts import item_index
 
 # Load environment variables
 load_dotenv(override=True)
@@ -18,10 +22,11 @@ db = client["chop-n-shop"]
 items_collection = db["items"]
 recipes_collection = db["recipes"]
 
-# Load FAISS index and item IDs
-faiss_index, item_ids = load_faiss_index("faiss_index_file.index", "ids_list.pkl")
-if not faiss_index or not item_ids:
-    raise ValueError("FAISS index or item IDs not loaded successfully. Ensure the files exist.")
+# Ranked candidates kept per ingredient, same depth as the live search
+MATCH_CANDIDATES = 100
+
+# Load the published FAISS index and item IDs (shared with openai_grocerylist, hot swapped on publish)
+item_index.load()
 
 # Normalize simplified ingredients for consistent processing
 def normalize_ingredients(simplified_ingredients):
@@ -33,8 +38,126 @@ def search_items_by_query_faiss(query):
     Search the FAISS index for items that match a query and return the MongoDB documents.
     """
     query_embedding = generate_embedding(query)
-    _, indices = faiss_index.search(np.array([query_embedding], dtype=np.float32), k=100)
-    return [items_collection.find_one({"_id": ObjectId(item_ids[idx])}) for idx in indices[0] if idx < len(item_ids)]
+    snapshot = item_index.current()
+    with timed("faiss_search"):
+        _, indices = snapshot.index.search(np.array([query_embedding], dtype=np.float32), k=100)
+    hit_ids = [snapshot.ids[idx] for idx in indices[0] if 0 <= idx < len(snapshot.ids)]
+    items = fetch_items(hit_ids)
+    return [items.get(item_id) for item_id in hit_ids]
+
+# Search for many queries at once: one encode call, one FAISS search
+def search_item_ids(queries, snapshot, k=MATCH_CANDIDATES):
+    """
+    Ranked item ids for each query in the given index snapshot: {query: [item id, ...]}.
+    """
+    if not queries:
+        return {}
+    with timed("embedding"):
+        embeddings = np.asarray(model.encode(list(queries)), dtype=np.float32)
+    with timed("faiss_search"):
+        _, indices = snapshot.index.search(embeddings, k)
+    return {query: [snapshot.ids[idx] for idx in row if 0 <= idx < len(snapshot.ids)] for query, row in zip(queries, indices)}
+
+# Fetch many items from the in-memory catalog, falling back to one MongoDB round trip
+def fetch_items(ids):
+    with timed("item_fetch"):
+        return item_catalog.items(set(map(str, ids)))
+
+# Ingredients a recipe is matched on
+def recipe_ingredients(recipe):
+    return list(dict.fromkeys(normalize_ingredients(recipe.get("simplified_ingredients") or recipe.get("ingredients") or [])))
+
+def ingredient_matches_document(ranked, index_version):
+    # Stored as a list: ingredient names may contain "." and cannot be used as field names
+    return {
+        "index_version": index_version,
+        "candidates": [{"ingredient": ingredient, "item_ids": [ObjectId(item_id) for item_id in ids]}
+                       for ingredient, ids in ranked.items()],
+    }
+
+def precompute_recipe_matches(recipe_id, recipe):
+    """
+    Store ranked item candidates for every ingredient of a recipe, stamped with the version of the
+    index snapshot that was searched.
+    """
+    snapshot = item_index.current()
+    index_version = snapshot.stamp
+    ranked = search_item_ids(recipe_ingredients(recipe), snapshot)
+    with timed("db_write"):
+        recipes_collection.update_one(
+            {"_id": ObjectId(recipe_id)},
+            {"$set": {"ingredient_matches": ingredient_matches_document(ranked, index_version)}}
+        )
+
+def refresh_recipe_matches(batch_size=200, progress=print):
+    """
+    Recompute matches for every recipe whose stamp differs from the live index version.
+    Run after publishing a new index; unique ingredients of each batch of recipes are searched once.
+    """
+    snapshot = item_index.current()
+    index_version = snapshot.stamp
+    stale = recipes_collection.find(
+        {"ingredient_matches.index_version": {"$ne": index_version}},
+        {"simplified_ingredients": 1, "ingredients": 1}
+    )
+    refreshed = 0
+    batch = []
+    for recipe in stale:
+        batch.append(recipe)
+        if len(batch) == batch_size:
+            refreshed += _refresh_batch(batch, snapshot)
+            batch = []
+            progress(f"{refreshed} recipes refreshed...")
+    if batch:
+        refreshed += _refresh_batch(batch, snapshot)
+    progress(f"Refreshed ingredient matches for {refreshed} recipes at index version {index_version}.")
+    return refreshed
+
+def _refresh_batch(recipes, snapshot):
+    index_version = snapshot.stamp
+    ranked = search_item_ids(list(dict.fromkeys(
+        ingredient for recipe in recipes for ingredient in recipe_ingredients(recipe)
+    )), snapshot)
+    with timed("db_write"):
+        recipes_collection.bulk_write([
+            UpdateOne({"_id": recipe["_id"]}, {"$set": {"ingredient_matches": ingredient_matches_document(
+                {ingredient: ranked[ingredient] for ingredient in recipe_ingredients(recipe)}, index_version
+            )}})
+            for recipe in recipes
+        ], ordered=False)
+    return len(recipes)
+
+def candidate_items(recipes):
+    """
+    {normalized ingredient: candidate item documents, best first} for a set of recipes. Stored
+    matches are used when their stamp matches the live index snapshot; the rest are
+    searched in that snapshot in one batch and written back so the next generation is a pure lookup.
+    """
+    snapshot = item_index.current()
+    index_version = snapshot.stamp
+    ranked = {}
+    stale = []
+    for recipe in recipes:
+        matches = recipe.get("ingredient_matches") or {}
+        if matches.get("index_version") == index_version:
+            for candidate in matches.get("candidates", []):
+                ranked.setdefault(candidate["ingredient"], [str(item_id) for item_id in candidate["item_ids"]])
+        else:
+            stale.append(recipe)
+
+    if stale:
+        missing = [ingredient for recipe in stale for ingredient in recipe_ingredients(recipe) if ingredient not in ranked]
+        ranked.update(search_item_ids(list(dict.fromkeys(missing)), snapshot))
+        with timed("db_write"):
+            recipes_collection.bulk_write([
+                UpdateOne({"_id": recipe["_id"]}, {"$set": {"ingredient_matches": ingredient_matches_document(
+                    {ingredient: ranked[ingredient] for ingredient in recipe_ingredients(recipe)}, index_version
+                )}})
+                for recipe in stale
+            ], ordered=False)
+
+    items = fetch_items(item_id for ids in ranked.values() for item_id in ids)
+    return {ingredient: [items[item_id] for item_id in ids if item_id in items] for ingredient, ids in ranked.items()}
 
 # Validate dietary preferences and allergens
 def is_item_valid(item, dietary_preferences, allergens):
@@ -95,11 +218,18 @@ def generate_grocery_list_from_recipe(recipe_id, user_preferences):
     total_cost = 0
     over_budget = 0
 
+    # Precomputed matches when the catalog has not changed since they were stored
+    candidates = candidate_items([recipe])
+
     for ingredient in recipe["simplified_ingredients"]:
-        query_results = search_items_by_query_faiss(ingredient)
+        query_results = candidates.get(ingredient.strip().lower(), [])
 
         for item in query_results:
-            if not item or not is_item_valid(item, user_preferences["Dietary_preferences"], user_preferences["Allergies"]):
+            if not item:
+                continue
+            with timed("filter"):
+                valid = is_item_valid(item, user_preferences["Dietary_preferences"], user_preferences["Allergies"])
+            if not valid:
                 continue
 
             item_price = float(item.get("Price", 0))
@@ -107,6 +237,7 @@ def generate_grocery_list_from_recipe(recipe_id, user_preferences):
             if new_total_cost <= user_preferences["Budget"]:
                 grocery_list.append({
                     "ingredient": ingredient,
+                    "item_id": item["_id"],  # Saved lists reference the item instead of copying it
                     "item_name": item["Item_name"],
                     "price": item_price,
                     "store": item["Store_name"]
@@ -124,6 +255,59 @@ def generate_grocery_list_from_recipe(recipe_id, user_preferences):
 
     return grocery_list, total_cost, over_budget
 
+# Generate one consolidated grocery list for a meal plan of several recipes
+def generate_meal_plan_grocery_list(recipe_ids, user_preferences):
+    """
+    Merge the simplified ingredients of several recipes, resolve each unique ingredient once and
+    fit the whole plan into one budget. Every item records the recipes it serves. over_budget is
+    how much the plan would cost beyond the budget if every matched ingredient were bought.
+    """
+    recipe_ids = [ObjectId(recipe_id) for recipe_id in recipe_ids]
+    recipes = {recipe["_id"]: recipe for recipe in recipes_collection.find(
+        {"_id": {"$in": recipe_ids}}, {"name": 1, "simplified_ingredients": 1, "ingredient_matches": 1}
+    )}
+    missing = [str(recipe_id) for recipe_id in recipe_ids if recipe_id not in recipes]
+    if missing:
+        raise ValueError(f"Recipes not found: {', '.join(missing)}")
+
+    # Ingredient -> recipes using it, in meal-plan order
+    ingredient_recipes = {}
+    for recipe_id in dict.fromkeys(recipe_ids):
+        for ingredient in normalize_ingredients(recipes[recipe_id].get("simplified_ingredients", [])):
+            ingredient_recipes.setdefault(ingredient, [])
+            if str(recipe_id) not in ingredient_recipes[ingredient]:
+                ingredient_recipes[ingredient].append(str(recipe_id))
+
+    query_results = candidate_items(list(recipes.values()))
+
+    grocery_list = []
+    total_cost = 0
+    full_cost = 0
+    for ingredient, serves in ingredient_recipes.items():
+        for item in query_results.get(ingredient, []):
+            with timed("filter"):
+                valid = is_item_valid(item, user_preferences["Dietary_preferences"], user_preferences["Allergies"])
+            if not valid:
+                continue
+
+            # First valid match per ingredient, as in generate_grocery_list_from_recipe
+            item_price = float(item.get("Price", 0))
+            full_cost += item_price
+            if total_cost + item_price <= user_preferences["Budget"]:
+                grocery_list.append({
+                    "ingredient": ingredient,
+                    "item_id": item["_id"],  # Saved lists reference the item instead of copying it
+                    "item_name": item["Item_name"],
+                    "price": item_price,
+                    "store": item["Store_name"],
+                    "recipe_ids": serves,
+                })
+                total_cost = round(total_cost + item_price, 2)
+            break
+
+    over_budget = round(max(0, full_cost - user_preferences["Budget"]), 2)
+    return grocery_list, total_cost, over_budget
+
 # # Example Usage
 # user_preferences = {
 #     "Budget": 100.00,
@@ -146,3 +330,7 @@ def generate_grocery_list_from_recipe(recipe_id, user_preferences):
 #         print("You are within your budget.")
 # except ValueError as e:
 #     print(e)
+
+# Recompute stale recipe matches after a catalog change: python openai_recipe_grocery_list.py
+if __name__ == "__main__":
+    refresh_recipe_matches()
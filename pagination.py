@@ -0,0 +1,78 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+import pymongo
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class InvalidCursor(ValueError):
+    pass
+
+# Clamp a requested page size into [1, MAX_PAGE_SIZE]
+def page_size(limit):
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+# Continuation tokens are opaque url-safe strings wrapping the last document's sort key
+def encode_cursor(document, sort_field=None):
+    key = {"id": str(document["_id"])}
+    if sort_field:
+        value = document.get(sort_field)
+        key["t"] = value.isoformat() if isinstance(value, datetime) else value
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort_field=None):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = ObjectId(key["id"])
+        if not sort_field:
+            return None, last_id
+        value = key.get("t")
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value, last_id
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def paginate(collection, query, limit=None, cursor=None, projection=None, sort_field=None, descending=True):
+    """
+    Keyset pagination over a collection.
+
+    Documents are ordered by (sort_field, _id), newest first by default, or by _id alone when
+    no sort_field is given. Each call fetches at most `limit` documents with a single indexed
+    range query, regardless of how far into the result set the cursor points.
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    limit = page_size(limit)
+    direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+    compare = "$lt" if descending else "$gt"
+    query = dict(query)
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, sort_field)
+        if sort_field:
+            after = {"$or": [
+                {sort_field: {compare: last_value}},
+                {sort_field: last_value, "_id": {compare: last_id}},
+            ]}
+            query = {"$and": [query, after]} if query else after
+        else:
+            query["_id"] = {compare: last_id}
+
+    sort = [(sort_field, direction), ("_id", direction)] if sort_field else [("_id", direction)]
+    if projection and sort_field and any(projection.values()):
+        # The sort key must come back so we can build the next cursor
+        projection = {**projection, sort_field: 1}
+
+    # Fetch one extra document to learn whether another page exists
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(documents[-1], sort_field) if has_more and documents else None
+    return documents, next_cursor
@@ -0,0 +1,145 @@
+import os
+import io
+import re
+import sys
+import time
+import random
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+# Fraction of requests to profile (0 disables sampling; the admin header still works)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# "sampling" (stack sampler over all threads, collapsed-stack flamegraph output) or "cprofile"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Shared secret for the X-Profile request header and the admin endpoints; unset disables both
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+
+# Only one request is profiled at a time: profilers are process-wide and would mix up each other's data
+_profile_lock = threading.Lock()
+
+class StackSampler:
+    """
+    Minimal sampling profiler: a background thread records the stack of every other thread
+    every `interval` seconds. Covers threadpool work (OpenAI, embeddings) that cProfile on the
+    event loop thread would miss. Concurrent requests show up too.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        # Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+def _should_profile(request):
+    if PROFILE_ADMIN_TOKEN and request.headers.get("x-profile") == PROFILE_ADMIN_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def _profile_name(request, elapsed):
+    path = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+    return f"{stamp}-{request.method}-{path}-{int(elapsed * 1000)}ms"
+
+def _enforce_retention():
+    profiles = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.is_file()), key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        os.remove(entry.path)
+
+def _save_profile(name, content):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w") as f:
+        f.write(content)
+    _enforce_retention()
+    return path
+
+async def profiling_middleware(request, call_next):
+    """
+    Profile a sample of requests (or any request sent with X-Profile: <admin token>)
+    and store the output in PROFILE_DIR.
+    """
+    if not _should_profile(request) or not _profile_lock.acquire(blocking=False):
+        return await call_next(request)
+
+    try:
+        start = time.perf_counter()
+        if PROFILE_MODE == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(60)
+            name = _profile_name(request, time.perf_counter() - start) + ".txt"
+            content = output.getvalue()
+        else:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                sampler.stop()
+            name = _profile_name(request, time.perf_counter() - start) + ".collapsed"
+            content = sampler.collapsed()
+
+        try:
+            _save_profile(name, content)
+            response.headers["X-Profile-Id"] = name
+        except OSError as e:
+            print(f"Error saving profile {name}: {e}")
+        return response
+    finally:
+        _profile_lock.release()
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.is_file()),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    return [{"name": entry.name, "size": entry.stat().st_size, "created_at": entry.stat().st_mtime} for entry in entries]
+
+def profile_path(name):
+    """
+    Resolve a stored profile by name, refusing anything outside PROFILE_DIR.
+    """
+    if os.path.basename(name) != name:
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
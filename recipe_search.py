@@ -0,0 +1,240 @@
+import re
+import time
+import bisect
+import itertools
+import threading
+from collections import defaultdict
+import numpy as np
+
+# How often (seconds) the in-process index is reloaded from the recipes collection
+DEFAULT_REFRESH_SECONDS = 300
+
+_word_pattern = re.compile(r"[a-z0-9]+")
+
+# Normalize recipe names and queries for consistent matching
+def normalize_name(name):
+    return " ".join(_word_pattern.findall(name.lower()))
+
+# Split a normalized name into padded trigrams ("  p", " pi", "piz", ...)
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Trigrams fully inside the text, i.e. the ones any name containing it must share
+def inner_trigrams(text):
+    if len(text) < 3:
+        return []
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+class _IndexState:
+    """
+    One immutable snapshot of the index. Readers grab the current snapshot once,
+    so a concurrent refresh never hands them half-built arrays.
+    """
+
+    def __init__(self, ids, names, normalized, postings):
+        self.ids = ids
+        self.names = names
+        self.normalized = normalized
+        self.trigram_counts = np.array([len(trigrams(name)) for name in normalized], dtype=np.float32)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+        # Sorted (normalized name, position) for names starting with a prefix
+        self.sorted_names = sorted((name, position) for position, name in enumerate(normalized))
+        # Sorted (word, position) for names containing a word starting with a prefix
+        self.sorted_words = sorted(
+            (word, position) for position, name in enumerate(normalized) for word in set(name.split())
+        )
+
+class RecipeNameIndex:
+    """
+    In-memory trigram and prefix index over recipe names.
+    Replaces unanchored regex scans of the recipes collection with array lookups.
+    """
+
+    def __init__(self, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._state = _IndexState([], [], [], {})
+        # Recipes added since the last build, scanned directly until the next refresh
+        self._pending = []
+
+    def __len__(self):
+        return len(self._state.ids) + len(self._pending)
+
+    def build(self, documents):
+        """
+        Rebuild the index from an iterable of {"_id", "name"} documents.
+        """
+        ids, names, normalized = [], [], []
+        postings = defaultdict(list)
+
+        for document in documents:
+            name = document.get("name")
+            if not name:
+                continue
+            normalized_name = normalize_name(name)
+            for gram in trigrams(normalized_name):
+                postings[gram].append(len(ids))
+            ids.append(str(document["_id"]))
+            names.append(name)
+            normalized.append(normalized_name)
+
+        state = _IndexState(ids, names, normalized, postings)
+        with self._lock:
+            self._state = state
+            self._pending = []
+            self.loaded_at = time.monotonic()
+
+    def add(self, recipe_id, name):
+        """
+        Add a single recipe without reloading the collection (e.g. right after it is saved).
+        """
+        with self._lock:
+            self._pending = self._pending + [(str(recipe_id), name, normalize_name(name))]
+
+    def refresh(self, collection):
+        """
+        Reload names from a MongoDB collection, only fetching the fields we index.
+        """
+        self.build(collection.find({}, {"name": 1}))
+
+    def _refresh_once(self, collection):
+        # Single flight: a refresh that finds another one running just returns
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            self.refresh(collection)
+        except Exception as e:
+            print(f"Error refreshing recipe name index: {e}")
+        finally:
+            self._refreshing.release()
+
+    def refresh_if_stale(self, collection):
+        """
+        Load the index on first use; afterwards reload it in the background when it is older than
+        refresh_seconds, serving the current snapshot meanwhile.
+        """
+        if self.loaded_at is None:
+            self._refresh_once(collection)
+        elif time.monotonic() - self.loaded_at > self.refresh_seconds and not self._refreshing.locked():
+            threading.Thread(target=self._refresh_once, args=(collection,), name="recipe-name-refresh",
+                             daemon=True).start()
+
+    def search(self, query, limit=10):
+        """
+        Rank recipes by trigram (Jaccard) similarity to the query.
+        Names containing the query verbatim are boosted above fuzzy matches.
+        Returns a list of (recipe_id, name, score).
+        """
+        state, pending = self._state, self._pending
+        normalized_query = normalize_name(query)
+        if not normalized_query or limit <= 0:
+            return []
+        all_query_grams = trigrams(normalized_query)
+
+        scored = []
+        for recipe_id, name, normalized_name in pending:
+            name_grams = trigrams(normalized_name)
+            shared = len(all_query_grams & name_grams)
+            if shared:
+                score = shared / len(all_query_grams | name_grams) + (normalized_query in normalized_name)
+                scored.append((score, recipe_id, name))
+
+        query_grams = [gram for gram in all_query_grams if gram in state.postings]
+        if query_grams:
+            scored.extend(self._search_state(state, normalized_query, query_grams, limit))
+        scored.sort(key=lambda entry: -entry[0])
+
+        return [(recipe_id, name, round(score, 4)) for score, recipe_id, name in scored[:limit]]
+
+    def _search_state(self, state, normalized_query, query_grams, limit):
+        overlap = np.bincount(
+            np.concatenate([state.postings[gram] for gram in query_grams]), minlength=len(state.ids)
+        ).astype(np.float32)
+        similarity = overlap / (len(trigrams(normalized_query)) + state.trigram_counts - overlap)
+
+        # Pick a shortlist by similarity, then apply the substring boost and re-rank
+        shortlist_size = min(len(similarity), limit * 5)
+        shortlist = np.argpartition(-similarity, shortlist_size - 1)[:shortlist_size]
+        scored = []
+        for position in shortlist:
+            if overlap[position] == 0:
+                continue
+            score = float(similarity[position])
+            if normalized_query in state.normalized[position]:
+                score += 1
+            scored.append((score, state.ids[position], state.names[position]))
+        return scored
+
+    def find_substring(self, query):
+        """
+        Return the id of the first recipe whose name contains the query (case-insensitive),
+        or None. Equivalent to the old ".*query.*" regex lookup.
+        """
+        state = self._state
+        normalized_query = normalize_name(query)
+        if not normalized_query:
+            return None
+
+        grams = inner_trigrams(normalized_query)
+        if grams:
+            postings = sorted((state.postings.get(gram, np.empty(0, dtype=np.int32)) for gram in grams), key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        else:
+            candidates = range(len(state.ids))
+
+        for position in candidates:
+            if normalized_query in state.normalized[position]:
+                return state.ids[position]
+        for recipe_id, _, normalized_name in self._pending:
+            if normalized_query in normalized_name:
+                return recipe_id
+        return None
+
+    def autocomplete(self, prefix, limit=10):
+        """
+        Suggest recipe names for a partially typed query.
+        Names starting with the prefix come first, then names with a later word starting with it.
+        """
+        state = self._state
+        normalized_prefix = normalize_name(prefix)
+        if not normalized_prefix:
+            return []
+
+        suggestions = []
+        seen = set()
+
+        start = bisect.bisect_left(state.sorted_names, (normalized_prefix,))
+        for name, position in state.sorted_names[start:start + limit]:
+            if not name.startswith(normalized_prefix):
+                break
+            suggestions.append(position)
+            seen.add(position)
+
+        if len(suggestions) < limit:
+            # Only the last word is being typed; earlier words must appear verbatim
+            last_word = normalized_prefix.split()[-1]
+            start = bisect.bisect_left(state.sorted_words, (last_word,))
+            for word, position in itertools.islice(state.sorted_words, start, None):
+                if len(suggestions) >= limit or not word.startswith(last_word):
+                    break
+                if position not in seen and normalized_prefix in state.normalized[position]:
+                    suggestions.append(position)
+                    seen.add(position)
+
+        results = [{"recipe_id": state.ids[p], "name": state.names[p]} for p in suggestions]
+        for recipe_id, name, normalized_name in self._pending:
+            if len(results) >= limit:
+                break
+            if normalized_name.startswith(normalized_prefix) or f" {normalized_prefix}" in normalized_name:
+                results.append({"recipe_id": recipe_id, "name": name})
+        return results
+
+# Shared index used by the API
+recipe_name_index = RecipeNameIndex()
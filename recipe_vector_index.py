@@ -0,0 +1,214 @@
+"""
+FAISS index over recipes for semantic search.
+
+The files on disk are a published snapshot: written at startup when missing, or by running this
+module (`python recipe_vector_index.py`), always to temporary files that are renamed into place.
+Saved recipes are added to each worker's in-memory index only. Every RECIPE_INDEX_CHECK_SECONDS a
+worker reloads the files if a newer snapshot was published and adds recipes other workers saved
+since then, in the background.
+"""
+import os
+import time
+import pickle
+import threading
+from datetime import datetime, timezone
+import faiss
+import numpy as np
+from bson.objectid import ObjectId
+from main import model, recipes_collection, load_faiss_index
+
+RECIPE_INDEX_FILE = "recipe_faiss_index_file.index"
+RECIPE_IDS_FILE = "recipe_ids_list.pkl"
+RECIPE_INDEX_CHECK_SECONDS = int(os.getenv("RECIPE_INDEX_CHECK_SECONDS", "60"))
+
+# Recipes inserted while a snapshot was being built may be slightly older than its files
+CATCH_UP_MARGIN_SECONDS = 300
+
+# Fields returned by semantic recipe search (no need to ship instructions for a result list)
+RECIPE_SEARCH_PROJECTION = {"name": 1, "simplified_ingredients": 1, "ingredients": 1, "image_url": 1, "total_time": 1}
+
+recipe_faiss_index = None
+recipe_ids = []
+_known_ids = set()
+_loaded_mtime = None  # mtime of the snapshot files the in-memory index started from
+_checked_at = 0
+_index_lock = threading.Lock()
+_syncing = threading.Lock()
+
+# Text we embed for a recipe: its name plus its simplified ingredients
+def recipe_text(recipe):
+    ingredients = recipe.get("simplified_ingredients") or recipe.get("ingredients") or []
+    name = recipe.get("name", "")
+    return f"{name}. Ingredients: {', '.join(ingredients)}" if ingredients else name
+
+# Embed many texts at once; much faster than one model.encode call per recipe
+def embed_texts(texts, batch_size=64):
+    return np.asarray(model.encode(texts, batch_size=batch_size), dtype="float32")
+
+# Build a FAISS index over every recipe in MongoDB
+def build_recipe_faiss_index(batch_size=256):
+    recipes = recipes_collection.find({}, {"name": 1, "simplified_ingredients": 1, "ingredients": 1})
+
+    index = None
+    ids = []
+    texts, batch_ids = [], []
+
+    def flush():
+        nonlocal index
+        embeddings = embed_texts(texts)
+        if index is None:
+            index = faiss.IndexFlatL2(embeddings.shape[1])  # L2 distance, same as the item index
+        index.add(embeddings)
+        ids.extend(batch_ids)
+        print(f"{len(ids)} recipe embeddings processed...")
+        texts.clear()
+        batch_ids.clear()
+
+    for recipe in recipes:
+        if not recipe.get("name"):
+            continue
+        texts.append(recipe_text(recipe))
+        batch_ids.append(str(recipe["_id"]))
+        if len(texts) >= batch_size:
+            flush()
+    if texts:
+        flush()
+
+    if index is None:
+        index = faiss.IndexFlatL2(model.get_sentence_embedding_dimension())
+
+    print(f"Recipe FAISS index built with {index.ntotal} recipes.")
+    return index, ids
+
+def _snapshot_mtime():
+    try:
+        return os.path.getmtime(RECIPE_INDEX_FILE)
+    except OSError:
+        return None
+
+def _replace_atomic(path, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Publish a snapshot; the ids go first so a reader never sees an index without its ids
+def save_recipe_index(index, ids):
+    _replace_atomic(RECIPE_IDS_FILE, lambda f: pickle.dump(ids, f))
+    _replace_atomic(RECIPE_INDEX_FILE, lambda f: f.write(faiss.serialize_index(index).tobytes()))
+    print(f"Recipe FAISS index saved with {index.ntotal} recipes.")
+
+def _load_snapshot():
+    if not (os.path.exists(RECIPE_INDEX_FILE) and os.path.exists(RECIPE_IDS_FILE)):
+        return None, None, None
+    mtime = _snapshot_mtime()
+    index, ids = load_faiss_index(RECIPE_INDEX_FILE, RECIPE_IDS_FILE)
+    if index is None or index.ntotal != len(ids):
+        # Caught between the two renames of a publish, or unreadable: keep what we have
+        return None, None, None
+    return index, ids, mtime
+
+def _use(index, ids, mtime):
+    global recipe_faiss_index, recipe_ids, _known_ids, _loaded_mtime
+    with _index_lock:
+        recipe_faiss_index, recipe_ids, _known_ids, _loaded_mtime = index, ids, set(ids), mtime
+
+# Load the recipe index from disk, or build and save it if the files are missing
+def load_or_build_recipe_index():
+    index, ids, mtime = _load_snapshot()
+    if index is None:
+        print("Recipe FAISS index files not found, rebuilding index...")
+        index, ids = build_recipe_faiss_index()
+        save_recipe_index(index, ids)
+        mtime = _snapshot_mtime()
+    _use(index, ids, mtime)
+    return index, ids
+
+# Incrementally add newly saved recipes to this worker's in-memory index
+def add_recipes_to_index(recipes):
+    if recipe_faiss_index is None:
+        load_or_build_recipe_index()
+    recipes = [recipe for recipe in recipes if recipe.get("name") and str(recipe["_id"]) not in _known_ids]
+    if not recipes:
+        return 0
+
+    embeddings = embed_texts([recipe_text(recipe) for recipe in recipes])
+    with _index_lock:
+        recipe_faiss_index.add(embeddings)
+        recipe_ids.extend(str(recipe["_id"]) for recipe in recipes)
+        _known_ids.update(str(recipe["_id"]) for recipe in recipes)
+    return len(recipes)
+
+def add_recipe_to_index(recipe_id, recipe):
+    return add_recipes_to_index([{**recipe, "_id": recipe_id}])
+
+def sync_recipe_index():
+    """
+    Pick up a newly published snapshot, then add recipes saved (by any worker) since it was built.
+    """
+    if not _syncing.acquire(blocking=False):
+        return
+    try:
+        mtime = _snapshot_mtime()
+        if mtime is not None and mtime != _loaded_mtime:
+            index, ids, mtime = _load_snapshot()
+            if index is not None:
+                _use(index, ids, mtime)
+        since = datetime.fromtimestamp(max(0, (_loaded_mtime or 0) - CATCH_UP_MARGIN_SECONDS), timezone.utc)
+        recent = recipes_collection.find(
+            {"_id": {"$gt": ObjectId.from_datetime(since)}}, {"name": 1, "simplified_ingredients": 1, "ingredients": 1}
+        )
+        added = add_recipes_to_index([recipe for recipe in recent if str(recipe["_id"]) not in _known_ids])
+        if added:
+            print(f"Added {added} recipes saved by other workers to the recipe index.")
+    except Exception as e:
+        print(f"Error syncing recipe index: {e}")
+    finally:
+        _syncing.release()
+
+def refresh_recipe_index_if_stale():
+    global _checked_at
+    now = time.monotonic()
+    if now - _checked_at < RECIPE_INDEX_CHECK_SECONDS or _syncing.locked():
+        return
+    _checked_at = now
+    threading.Thread(target=sync_recipe_index, name="recipe-index-sync", daemon=True).start()
+
+# Semantic search over recipes, e.g. "quick vegan dinner"
+def search_recipes_semantic(query, top_k=10):
+    """
+    Return up to top_k recipes closest to the query, best match first, each with a similarity score.
+    """
+    if recipe_faiss_index is None:
+        load_or_build_recipe_index()
+    else:
+        refresh_recipe_index_if_stale()
+    if not recipe_ids:
+        return []
+
+    query_np = embed_texts([query])
+    with _index_lock:
+        distances, indices = recipe_faiss_index.search(query_np, min(top_k, len(recipe_ids)))
+        hits = [(recipe_ids[idx], float(dist)) for dist, idx in zip(distances[0], indices[0]) if idx != -1]
+
+    # Hydrate every hit with a single query, then restore FAISS order
+    recipes = recipes_collection.find(
+        {"_id": {"$in": [ObjectId(recipe_id) for recipe_id, _ in hits]}}, RECIPE_SEARCH_PROJECTION
+    )
+    recipes_by_id = {str(recipe["_id"]): recipe for recipe in recipes}
+
+    results = []
+    for recipe_id, dist in hits:
+        recipe = recipes_by_id.get(recipe_id)
+        if recipe:
+            recipe["_id"] = recipe_id
+            recipe["score"] = round(1 - dist, 4)  # Convert distance to similarity, as for items
+            results.append(recipe)
+    return results
+
+if __name__ == "__main__":
+    # Rebuild the recipe index from scratch and publish it; workers reload it on their next check
+    index, ids = build_recipe_faiss_index()
+    save_recipe_index(index, ids)
@@ -0,0 +1,250 @@
+"""
+One FAISS index per store, so a query can target a single store and a store can be re-indexed
+without touching the others.
+
+Each build of a shard gets a new version: <store slug>.<version>.index / .ids.pkl are written
+under temporary names, fsynced and renamed into place, then <store slug>.store (store name and
+version) is replaced atomically to point at them. Workers keep the list of shards in memory and
+re-read the .store files every SHARD_CHECK_SECONDS in the background; a shard whose version moved
+is dropped and the next search loads the new files. Searching several shards runs them in parallel
+on a thread pool (FAISS releases the GIL) and merges the hits by distance.
+
+Searches only go to the shards when every store they cover has one (covers()); otherwise the
+combined index is used, so a store that was never sharded does not drop out of the results.
+
+Usage:
+    python store_shards.py build                  # every store in the items collection
+    python store_shards.py build "Trader Joe's"   # re-index one store only
+    python store_shards.py list
+"""
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import pickle
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from main import items_collection, load_faiss_index
+
+SHARD_DIR = os.getenv("FAISS_SHARD_DIR", "faiss_shards")
+SEARCH_WORKERS = int(os.getenv("FAISS_SHARD_WORKERS", "8"))
+
+# Seconds between checks of the shard versions on disk
+SHARD_CHECK_SECONDS = int(os.getenv("FAISS_SHARD_CHECK_SECONDS", "30"))
+
+def shard_name(store):
+    # Filesystem-safe and unambiguous: readable slug plus a short hash of the exact store name
+    slug = re.sub(r"[^a-z0-9]+", "-", store.lower()).strip("-")
+    return f"{slug}-{hashlib.sha1(store.encode()).hexdigest()[:8]}"
+
+def shard_files(store, shard_dir=SHARD_DIR, version=None):
+    # Shards built before versioning have no version in their file names
+    name = f"{shard_name(store)}.{version}" if version else shard_name(store)
+    return os.path.join(shard_dir, f"{name}.index"), os.path.join(shard_dir, f"{name}.ids.pkl")
+
+def _replace_atomic(path, write):
+    # Write next to the target, fsync and rename over it: readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_shard_versions(shard_dir=SHARD_DIR):
+    """
+    {store: version} from the .store files; version is None for unversioned (older) shards.
+    """
+    if not os.path.isdir(shard_dir):
+        return {}
+    versions = {}
+    for name in sorted(os.listdir(shard_dir)):
+        if not name.endswith(".store"):
+            continue
+        with open(os.path.join(shard_dir, name), encoding="utf-8") as f:
+            content = f.read()
+        try:
+            manifest = json.loads(content)
+            versions[manifest["store"]] = manifest["version"]
+        except (ValueError, TypeError, KeyError):
+            versions[content] = None  # Plain store name written by older builds
+    return versions
+
+def _prune_shard(store, shard_dir, keep):
+    # Remove older versions of one shard, keeping `keep` (the live one and the one before it)
+    prefix = f"{shard_name(store)}."
+    versions = {name[len(prefix):].split(".")[0] for name in os.listdir(shard_dir)
+                if name.startswith(prefix) and name.endswith((".index", ".ids.pkl"))}
+    old = sorted(version for version in versions if version.isdigit() and version not in keep)
+    for version in old:
+        for path in shard_files(store, shard_dir, version):
+            if os.path.exists(path):
+                os.remove(path)
+
+def build_store_shard(store, shard_dir=SHARD_DIR):
+    """
+    Build the shard for one store from the embeddings stored in MongoDB and make it the live version.
+    """
+    embeddings, ids = [], []
+    for item in items_collection.find({"Store_name": store, "embedding": {"$exists": True}}, {"embedding": 1}):
+        embeddings.append(pickle.loads(item["embedding"]))
+        ids.append(str(item["_id"]))
+    if not embeddings:
+        print(f"No embedded items for {store}, skipping shard.")
+        return None
+
+    embeddings_np = np.array(embeddings).astype("float32")
+    index = faiss.IndexFlatL2(embeddings_np.shape[1])  # Same metric as the combined index
+    index.add(embeddings_np)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    previous = read_shard_versions(shard_dir).get(store)
+    version = f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}{time.time_ns() % 10 ** 9:09d}"
+    index_file, ids_file = shard_files(store, shard_dir, version)
+    _replace_atomic(index_file, lambda f: f.write(faiss.serialize_index(index).tobytes()))
+    _replace_atomic(ids_file, lambda f: pickle.dump(ids, f))
+    # Switch to the new files; the .store file also maps the shard back to its store name without MongoDB
+    manifest = json.dumps({"store": store, "version": version}).encode("utf-8")
+    _replace_atomic(os.path.join(shard_dir, f"{shard_name(store)}.store"), lambda f: f.write(manifest))
+    _prune_shard(store, shard_dir, keep=[version, previous])
+    print(f"Shard for {store} built with {index.ntotal} items (version {version}).")
+    return index, ids
+
+def build_store_shards(stores=None, shard_dir=SHARD_DIR):
+    stores = stores or sorted(items_collection.distinct("Store_name"))
+    for store in stores:
+        build_store_shard(store, shard_dir)
+    item_shards.refresh()
+    return stores
+
+class ShardedItemIndex:
+    def __init__(self, shard_dir=SHARD_DIR, workers=SEARCH_WORKERS, check_interval=SHARD_CHECK_SECONDS):
+        self.shard_dir = shard_dir
+        self.check_interval = check_interval
+        self.checked_at = 0
+        self._versions = None  # store -> live shard version, from the last check of the .store files
+        self._catalog_stores = set()  # stores with embedded items, as of the last check
+        self._shards = {}  # store -> (version, index, ids), filled on first use
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="faiss-shard")
+
+    def refresh(self):
+        """
+        Re-read the shard versions now and drop loaded shards whose version moved.
+        """
+        with self._refreshing:
+            versions = read_shard_versions(self.shard_dir)
+            if versions:
+                try:
+                    self._catalog_stores = set(
+                        items_collection.distinct("Store_name", {"embedding": {"$exists": True}})
+                    )
+                except Exception as e:
+                    # Keep the stores from the previous check
+                    print(f"Error reading the catalog stores for the shards: {e}")
+            with self._lock:
+                for store in [store for store, shard in self._shards.items() if versions.get(store, False) != shard[0]]:
+                    del self._shards[store]
+                self._versions = versions
+            self.checked_at = time.monotonic()
+        return versions
+
+    def refresh_if_stale(self):
+        # First use reads the versions inline; later checks run in the background
+        if self._versions is None:
+            self.refresh()
+            return
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval or self._refreshing.locked():
+            return
+        self.checked_at = now
+        threading.Thread(target=self.refresh, name="item-shards-refresh", daemon=True).start()
+
+    def stores(self):
+        """
+        Stores that have a shard on disk.
+        """
+        self.refresh_if_stale()
+        return list(self._versions)
+
+    def available(self):
+        return bool(self.stores())
+
+    def covers(self, stores=None):
+        """
+        Whether every one of `stores` (default: every store in the catalog) has a shard.
+        """
+        sharded = set(self.stores())
+        stores = set(stores) if stores else self._catalog_stores
+        return bool(sharded) and bool(stores) and stores <= sharded
+
+    def shard(self, store):
+        """
+        The (index, ids) of a store's live version, loading it on first use; None if it has no shard.
+        """
+        versions = self._versions if self._versions is not None else self.refresh()
+        if store not in versions:
+            return None
+        version = versions[store]
+        with self._lock:
+            cached = self._shards.get(store)
+            if cached is not None and cached[0] == version:
+                return cached[1], cached[2]
+        index_file, ids_file = shard_files(store, self.shard_dir, version)
+        if not os.path.exists(index_file):
+            return None
+        index, ids = load_faiss_index(index_file, ids_file)
+        if index is None:
+            return None
+        with self._lock:
+            if self._versions is not None and self._versions.get(store) == version:
+                self._shards[store] = (version, index, ids)
+        return index, ids
+
+    def _search_shard(self, store, query, k):
+        shard = self.shard(store)
+        if shard is None:
+            return []
+        index, ids = shard
+        distances, indices = index.search(query, min(k, index.ntotal))
+        return [(float(distance), ids[idx], store) for distance, idx in zip(distances[0], indices[0]) if 0 <= idx < len(ids)]
+
+    def search(self, query_embedding, k=10, stores=None):
+        """
+        Top k (distance, item id, store) over the given stores (default: every shard), nearest first.
+        Only complete when covers(stores).
+        """
+        query = np.asarray([query_embedding], dtype=np.float32)
+        stores = stores or self.stores()
+        if len(stores) == 1:
+            return self._search_shard(stores[0], query, k)
+        results = self._executor.map(lambda store: self._search_shard(store, query, k), stores)
+        return heapq.nsmallest(k, (hit for hits in results for hit in hits))
+
+item_shards = ShardedItemIndex()
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_store_shards(sys.argv[2:] or None)
+    elif command == "list":
+        for store in item_shards.stores():
+            index, ids = item_shards.shard(store)
+            print(f"{store}: {index.ntotal} items")
+    else:
+        print('Usage: python store_shards.py [build [store ...]|list]')
+
+if __name__ == "__main__":
+    main()